@@ -0,0 +1,104 @@
+# AOT.py
+# This file compiles modules ahead of time into object files, and links them into shared libraries and executables
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import llvmlite.binding as llvm
+
+# What an ahead of time build can write: a relocatable object, a shared library or a standalone executable
+OUTPUT_KINDS: tuple[str, ...] = ("obj", "shared", "exe")
+
+# The file extension of each kind of output on this platform
+SUFFIXES: dict[str, str] = {"obj": ".o", "shared": ".dylib" if sys.platform == "darwin" else ".so", "exe": ""}
+
+# The C compilers tried in order when $CC is not set, they drive the system linker and add the C runtime
+LINKERS: tuple[str, ...] = ("cc", "clang", "gcc")
+
+# The relocation model of the code built ahead of time, which both shared libraries and the position independent
+# executables most systems build by default need
+RELOC_MODEL: str = "pic"
+
+# The libraries every program is linked against, LLVM lowers `%` on floats to a call to `fmodf`
+LIBRARIES: tuple[str, ...] = ("-lm",)
+
+def find_linker() -> str | None:
+    """
+    Returns the C compiler used to link, $CC if it is set, otherwise the first of `LINKERS` on the PATH
+    """
+    if os.environ.get("CC"):
+        return os.environ["CC"]
+
+    for name in LINKERS:
+        if shutil.which(name) is not None:
+            return name
+    return None
+
+def create_target_machine(opt_level: int = 2) -> llvm.TargetMachine:
+    """
+    Returns a target machine for the host that builds code with `RELOC_MODEL`
+    """
+    return llvm.Target.from_default_triple().create_target_machine(opt=opt_level, reloc=RELOC_MODEL)
+
+def link(objects: list[Path], output: Path, kind: str = "exe", linker: str | None = None) -> None:
+    """
+    Links the object files `objects` into `output` with the system toolchain, as one of `OUTPUT_KINDS`: "obj" joins
+    them into one relocatable object. An executable starts at the program's `main`, which the C runtime calls and
+    whose result is the exit code
+    """
+    if kind not in OUTPUT_KINDS:
+        raise ValueError(f"Unknown output kind {kind}, expected one of {', '.join(OUTPUT_KINDS)}")
+
+    linker = linker or find_linker()
+    if linker is None:
+        raise RuntimeError(f"No C compiler found to link with, set $CC or install one of {', '.join(LINKERS)}")
+
+    command: list[str] = [linker, *map(str, objects), "-o", str(output)]
+    if kind == "obj":
+        command.insert(1, "-r")
+    else:
+        command[-2:-2] = LIBRARIES
+    if kind == "shared":
+        command.insert(1, "-shared")
+
+    completed = subprocess.run(command, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{' '.join(command)} failed:\n{completed.stderr.strip()}")
+
+def write_objects(objects: list[bytes], output: Path, kind: str = "exe", linker: str | None = None) -> Path:
+    """
+    Writes the object code `objects` to `output` as `kind`, one of `OUTPUT_KINDS`, linking them when it takes more
+    than writing a single object. Returns the path that was written, `output` with the suffix of `kind` when it had none
+    """
+    if kind not in OUTPUT_KINDS:
+        raise ValueError(f"Unknown output kind {kind}, expected one of {', '.join(OUTPUT_KINDS)}")
+
+    output = Path(output)
+    if output.suffix == "":
+        output = output.with_suffix(SUFFIXES[kind])
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    if kind == "obj" and len(objects) == 1:
+        output.write_bytes(objects[0])
+        return output
+
+    # The objects only need to exist until they have been linked
+    with tempfile.TemporaryDirectory() as directory:
+        paths: list[Path] = []
+        for i, data in enumerate(objects):
+            paths.append(Path(directory) / f"{output.stem}.{i}.o")
+            paths[-1].write_bytes(data)
+        link(paths, output, kind, linker)
+
+    return output
+
+def build(module: llvm.ModuleRef, target_machine: llvm.TargetMachine, output: Path, kind: str = "exe", linker: str | None = None) -> Path:
+    """
+    Compiles the parsed and optimized `module` to machine code and writes it to `output` as `kind`,
+    one of `OUTPUT_KINDS`. Returns the path that was written, `output` with the suffix of `kind` when it had none
+    """
+    return write_objects([target_machine.emit_object(module)], output, kind, linker)
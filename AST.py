@@ -3,7 +3,12 @@
 
 from abc import ABC, abstractmethod
 from enum import Enum
+from typing import Any, Callable
+import copy
 import json
+import re
+
+from SymbolTable import SYMBOL_TABLE
 
 class NodeType(Enum): # RANT: this is the way the python handles enumeration
 
@@ -34,8 +39,12 @@ class NodeType(Enum): # RANT: this is the way the python handles enumeration
 class Node(ABC):
     """
     Node is an abstract base class which other classes will inherit from.
-    It provides abstract methods `type()` and `data()`
+    It provides abstract methods `type()` and `data()`, and `child_fields` names
+    the attributes that hold child nodes (or lists of them) for the visitors
     """
+    __slots__ = ()
+    child_fields: tuple[str, ...] = ()
+
     @abstractmethod
     def type(self) -> NodeType:
         "Returns the NodeType of the Node"
@@ -59,21 +68,32 @@ class Statement(Node):
     Statements are a block of code that doesn't neccessarily prodice a result:
     For example: `print(my_string)`, `x = 5`, `if (x > 10): ...` and `for i in range(10): ...`
     """
-    pass
+    __slots__ = ()
 
 class Expression(Node):
     """
     Expressions are a block of code that evaluate to a value.
     For example: `len(my_string)`, `2 + 2` and `add(5, 5)`
+
+    Attributes
+    ----------
+    resolved_type : str | None
+        the type the expression evaluates to, "int", "float" or "bool", set by the TypeChecker.
+        Literals know theirs from the start, every other expression is None until it is checked
     """
-    pass
+    __slots__ = ("resolved_type",)
 
 class Program(Node):
     """
     This is the top/head node where parsing will begin. It contains a list of statments at `self.statements`.
+    The Resolver sets `self.frame_size` to the number of global slots.
     """
+    __slots__ = ("statements", "frame_size")
+    child_fields = ("statements",)
+
     def __init__(self) -> None:
         self.statements: list[Statement] = []
+        self.frame_size: int | None = None
 
     def type(self) -> NodeType:
         return NodeType.Program
@@ -92,11 +112,28 @@ class Program(Node):
 # region Helpers
 class FunctionParameter(Expression):
     """
-    TODO: Add Docstring
+    A parameter in a function definition. Ex: the `x: int` in `func f(x: int)`
+
+    Attributes
+    ----------
+    name : str
+        the name of the parameter
+    value_type : str
+        the type of the parameter
+    symbol : int
+        the `SYMBOL_TABLE` id of `name`
     """
-    def __init__(self, name: str, value_type: str = None) -> None:
+    __slots__ = ("name", "value_type", "symbol")
+
+    def __init__(self, name: str, value_type: str = None, symbol: int = None) -> None:
         self.name = name
         self.value_type = value_type
+        self.symbol: int = symbol if symbol is not None else SYMBOL_TABLE.intern(name)
+        self.resolved_type: str | None = None
+
+    def __reduce__(self) -> tuple:
+        # Symbol ids only mean something in the process that interned them, so the name is interned again when unpickled
+        return FunctionParameter, (self.name, self.value_type)
     
     def type(self) -> NodeType:
         return NodeType.FunctionParameter
@@ -115,6 +152,9 @@ class ExpressionStatement(Statement):
     """
     An Expression Statement is a Statement that evaluates to an expression
     """
+    __slots__ = ("expr",)
+    child_fields = ("expr",)
+
     def __init__(self, expr: Expression = None) -> None:
         self.expr: Expression = expr
 
@@ -140,6 +180,9 @@ class LetStatement(Statement):
     value_type : str
         the type of the variable to be assigned
     """
+    __slots__ = ("name", "value", "value_type")
+    child_fields = ("name", "value")
+
     def __init__(self, name: Expression = None, value: Expression = None, value_type: str = None) -> None:
         self.name: Expression = name
         self.value: Expression = value
@@ -165,6 +208,9 @@ class BlockStatement(Statement):
     statements : list[Statement]
         the list of statements contained within the Block Statement
     """
+    __slots__ = ("statements",)
+    child_fields = ("statements",)
+
     def __init__(self, statements: list[Statement] = None) -> None:
         self.statements = statements if statements is not None else []
 
@@ -181,6 +227,9 @@ class ReturnStatement(Statement):
     """
     TODO: Add Docstring
     """
+    __slots__ = ("return_value",)
+    child_fields = ("return_value",)
+
     def __init__(self, return_value: Expression = None) -> None:
         self.return_value = return_value
 
@@ -197,11 +246,15 @@ class FunctionStatement(Statement):
     """
     TODO: Add Docstring
     """
-    def __init__(self, parameters: list[FunctionParameter] = [], body: BlockStatement = None, name = None, return_type: str = None) -> None:
-        self.parameters = parameters
+    __slots__ = ("parameters", "body", "name", "return_type", "frame_size")
+    child_fields = ("name", "parameters", "body")
+
+    def __init__(self, parameters: list[FunctionParameter] = None, body: BlockStatement = None, name = None, return_type: str = None) -> None:
+        self.parameters = parameters if parameters is not None else []
         self.body = body
         self.name = name
         self.return_type = return_type
+        self.frame_size: int | None = None
 
     def type(self) -> NodeType:
         return NodeType.FunctionStatement
@@ -219,6 +272,9 @@ class AssignStatement(Statement):
     """
     TODO: Add Docstring
     """
+    __slots__ = ("ident", "right_value")
+    child_fields = ("ident", "right_value")
+
     def __init__(self, ident: Expression = None, right_value: Expression = None) -> None:
         self.ident = ident
         self.right_value = right_value
@@ -237,6 +293,9 @@ class IfStatement(Statement):
     """
     TODO: Add Docstring
     """
+    __slots__ = ("condition", "consequence", "alternative")
+    child_fields = ("condition", "consequence", "alternative")
+
     def __init__(self, condition: Expression = None, consequence: BlockStatement = None, alternative: BlockStatement = None) -> None:
         self.condition = condition
         self.consequence = consequence
@@ -260,10 +319,14 @@ class InfixExpression(Expression):
     """
     TODO: Add Docstring
     """
+    __slots__ = ("left_node", "operator", "right_node")
+    child_fields = ("left_node", "right_node")
+
     def __init__(self, left_node: Expression, operator: str, right_node: Expression = None) -> None:
        self.left_node: Expression = left_node
        self.operator: str = operator
        self.right_node: Expression = right_node
+       self.resolved_type: str | None = None
     
     def type(self) -> NodeType:
         return NodeType.InfixExpression
@@ -280,9 +343,13 @@ class CallExpression(Expression):
     """
     TODO: Add Docstring
     """
+    __slots__ = ("function", "arguments")
+    child_fields = ("function", "arguments")
+
     def __init__(self, function: Expression = None, arguments: list[Expression] = None) -> None:
        self.function = function
        self.arguments = arguments
+       self.resolved_type: str | None = None
     
     def type(self) -> NodeType:
         return NodeType.CallExpression
@@ -300,8 +367,11 @@ class IntegerLiteral(Expression):
     """
     TODO: Add Docstring
     """
+    __slots__ = ("value",)
+
     def __init__(self, value: int = None) -> None:
        self.value: int = value
+       self.resolved_type: str | None = "int"
     
     def type(self) -> NodeType:
         return NodeType.IntegerLiteral
@@ -316,8 +386,11 @@ class FloatLiteral(Expression):
     """
     TODO: Add Docstring
     """
+    __slots__ = ("value",)
+
     def __init__(self, value: float = None) -> None:
        self.value: int = value
+       self.resolved_type: str | None = "float"
     
     def type(self) -> NodeType:
         return NodeType.FloatLiteral
@@ -330,10 +403,31 @@ class FloatLiteral(Expression):
 
 class IdentifierLiteral(Expression):
     """
-    TODO: Add Docstring
-    """
-    def __init__(self, value: str = None) -> None:
+    The name of a variable or function. Ex: `x`
+
+    Attributes
+    ----------
+    value : str
+        the name
+    symbol : int
+        the `SYMBOL_TABLE` id of the name, which the Environment is keyed on
+    depth : int | None
+        how many functions deep the scope the name is declared in is, 0 for the global scope, set by the Resolver
+    slot : int | None
+        the index of the name in the slots of that scope, set by the Resolver
+    """
+    __slots__ = ("value", "symbol", "depth", "slot")
+
+    def __init__(self, value: str = None, symbol: int = None) -> None:
        self.value: str = value
+       self.symbol: int = symbol if symbol is not None or value is None else SYMBOL_TABLE.intern(value)
+       self.resolved_type: str | None = None
+       self.depth: int | None = None
+       self.slot: int | None = None
+
+    def __reduce__(self) -> tuple:
+        # The id the name had in the process that pickled it means nothing here, so it is interned again
+        return IdentifierLiteral, (self.value,)
     
     def type(self) -> NodeType:
         return NodeType.IdentifierLiteral
@@ -348,8 +442,11 @@ class BooleanLiteral(Expression):
     """
     TODO: Add Docstring
     """
+    __slots__ = ("value",)
+
     def __init__(self, value: bool = None) -> None:
        self.value: bool = value
+       self.resolved_type: str | None = "bool"
     
     def type(self) -> NodeType:
         return NodeType.BooleanLiteral
@@ -359,4 +456,105 @@ class BooleanLiteral(Expression):
             "type": self.type().value,
             "value": self.value
         }
-# endregion
\ No newline at end of file
+# endregion
+
+# region Visitors
+def visit_method_name(node_class: type) -> str:
+    """
+    Returns the name of the method a visitor handles `node_class` with, Ex: `visit_if_statement` for `IfStatement`
+    """
+    return "visit_" + re.sub(r"(?<!^)(?=[A-Z])", "_", node_class.__name__).lower()
+
+class NodeVisitor:
+    """
+    A NodeVisitor walks an AST by calling the `visit_<node type>` method for each node, Ex: `visit_infix_expression`,
+    or `generic_visit` when the visitor has none. The method for each class of node is looked up once per visitor
+    class and kept in a table, so a visit costs one dictionary lookup no matter how many kinds of node there are.
+
+    Methods
+    ----------
+    def visit(self, node: Node) -> Any:
+        calls the method for `node` and returns what it returns
+
+    def generic_visit(self, node: Node) -> Any:
+        visits every child of `node`
+    """
+    # The visit method of each node class, one table per visitor class
+    _dispatch: dict[type, Callable] = {}
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        cls._dispatch = {}
+
+    def visit(self, node: Node) -> Any:
+        method: Callable | None = self._dispatch.get(node.__class__)
+        if method is None:
+            method = self.__resolve(node.__class__)
+        return method(self, node)
+
+    @classmethod
+    def __resolve(cls, node_class: type) -> Callable:
+        method: Callable = getattr(cls, visit_method_name(node_class), cls.generic_visit)
+        cls._dispatch[node_class] = method
+        return method
+
+    def generic_visit(self, node: Node) -> Any:
+        for field in node.child_fields:
+            child: Node | list[Node] | None = getattr(node, field)
+            if isinstance(child, list):
+                for item in child:
+                    self.visit(item)
+            elif child is not None:
+                self.visit(child)
+
+class NodeTransformer(NodeVisitor):
+    """
+    A NodeTransformer is a NodeVisitor whose methods return the node to put in place of the one they visited.
+    Inside a list of nodes, a method can also return None to remove the node or a list of nodes to put in its place.
+
+    `generic_visit` never changes a node it was given: when a child is replaced, it returns a shallow copy with the new
+    child. The nodes that did not change are shared with the old tree, so the old tree stays valid for anything still
+    holding it, like the IncrementalParser cache or a DebugWriter that has not finished writing it.
+
+    Methods
+    ----------
+    def generic_visit(self, node: Node) -> Node:
+        visits every child of `node` and returns `node`, or a copy of it if a child was replaced
+    """
+    def generic_visit(self, node: Node) -> Node:
+        result: Node = node
+        for field in node.child_fields:
+            child: Node | list[Node] | None = getattr(node, field)
+            if isinstance(child, list):
+                new_child: Node | list[Node] | None = self.visit_list(child)
+            elif child is not None:
+                new_child = self.visit(child)
+            else:
+                continue
+
+            if new_child is not child:
+                if result is node:
+                    result = copy.copy(node)
+                setattr(result, field, new_child)
+
+        return result
+
+    def visit_list(self, nodes: list[Node]) -> list[Node]:
+        """
+        Visits each node in `nodes`, returning `nodes` itself when none of them were replaced
+        """
+        result: list[Node] | None = None
+        for i, node in enumerate(nodes):
+            new_node: Node | list[Node] | None = self.visit(node)
+            if new_node is node and result is None:
+                continue
+
+            if result is None:
+                result = nodes[:i]
+            if isinstance(new_node, list):
+                result.extend(new_node)
+            elif new_node is not None:
+                result.append(new_node)
+
+        return nodes if result is None else result
+# endregion
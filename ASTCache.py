@@ -0,0 +1,106 @@
+# ASTCache.py
+# This file implements an ASTCache that stores parsed programs on disk, so unchanged files skip the Lexer and Parser
+
+import gc
+import hashlib
+import os
+from pathlib import Path
+
+from AST import Program
+from Compiler import COMPILER_VERSION
+from FlatAST import FlatAST
+from Lexer import CHUNK_SIZE
+
+# The directory the cached programs are written to by default
+CACHE_DIR: Path = Path(".trtl_cache")
+
+# The size of the hash of the contents each cache file starts with
+CHECKSUM_SIZE: int = 16
+
+def write_atomic(path: Path, data: bytes) -> None:
+    """
+    Writes `data` to a temporary file next to `path` and renames it over `path`, so a reader never sees half of a file
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    temp: Path = path.with_suffix(f".{os.getpid()}.tmp")
+    temp.write_bytes(data)
+    os.replace(temp, path)
+
+class ASTCache:
+    """
+    An ASTCache stores each parsed Program as a serialized FlatAST, in a file named after a hash of the source
+    and `COMPILER_VERSION`. Loading a program is a single read of that file.
+
+    Each file starts with a hash of the FlatAST after it, so a file cut short, changed on disk or written by
+    something else is deleted and treated as a miss, as is anything the FlatAST cannot be rebuilt from.
+
+    Attributes
+    ----------
+    directory : Path
+        the directory the cache files are kept in
+
+    Methods
+    ----------
+    def key(self, source: bytes) -> str:
+        returns the cache key of `source`
+
+    def key_file(self, path: Path) -> str:
+        returns the cache key of the file at `path`, reading it `CHUNK_SIZE` bytes at a time
+
+    def load(self, key: str) -> Program | None:
+        returns the cached Program, or None when there is none
+
+    def store(self, key: str, program: Program) -> None:
+        writes `program` to the cache
+    """
+    def __init__(self, directory: Path = CACHE_DIR) -> None:
+        self.directory = Path(directory)
+
+    def __digest(self) -> "hashlib.blake2b":
+        digest = hashlib.blake2b(COMPILER_VERSION.encode(), digest_size=20)
+        digest.update(b"\0")
+        return digest
+
+    def key(self, source: bytes) -> str:
+        digest = self.__digest()
+        digest.update(source)
+        return digest.hexdigest()
+
+    def key_file(self, path: Path) -> str:
+        digest = self.__digest()
+        with open(path, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def __path(self, key: str) -> Path:
+        return self.directory / f"{key}.ast"
+
+    def load(self, key: str) -> Program | None:
+        try:
+            data: bytes = self.__path(key).read_bytes()
+        except OSError:
+            return None
+
+        checksum, data = data[:CHECKSUM_SIZE], data[CHECKSUM_SIZE:]
+        if len(data) == 0 or hashlib.blake2b(data, digest_size=CHECKSUM_SIZE).digest() != checksum:
+            self.__path(key).unlink(missing_ok=True)
+            return None
+
+        # The AST has no reference cycles, so the collector would only slow rebuilding it down
+        gc_enabled: bool = gc.isenabled()
+        gc.disable()
+        try:
+            return FlatAST.from_bytes(data).to_program()
+        except Exception:
+            # A file that passed the checksum but still does not decode, like one from another FlatAST layout
+            self.__path(key).unlink(missing_ok=True)
+            return None
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def store(self, key: str, program: Program) -> None:
+        data: bytes = FlatAST.from_program(program).to_bytes()
+        write_atomic(self.__path(key), hashlib.blake2b(data, digest_size=CHECKSUM_SIZE).digest() + data)
@@ -0,0 +1,164 @@
+# Batch.py
+# This file compiles many turtle script files at once, spread over a pool of worker processes.
+# Run it with `python Batch.py src/ -o out/ --emit obj`, or `--emit exe` to link an executable for each one
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from llvmlite import ir
+import llvmlite.binding as llvm
+
+from Lexer import Lexer
+from Parser import Parser
+from TypeChecker import TypeChecker
+from Compiler import Compiler
+from PassPipeline import OPT_LEVELS
+from AOT import OUTPUT_KINDS, SUFFIXES, build
+import ParallelCompiler
+from TokenBuffer import TokenBuffer
+from AST import Program
+
+class BatchResult:
+    """
+    The outcome of compiling one file
+
+    Attributes
+    ----------
+    path : str
+        the source file that was compiled
+    errors : list[str]
+        the Parser, TypeChecker, Compiler or LLVM errors, empty when the file compiled
+    timings : dict[str, float]
+        the seconds spent in each phase, in the order they ran
+    output : str | None
+        the file that was written, if any
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.errors: list[str] = []
+        self.timings: dict[str, float] = {}
+        self.output: str | None = None
+
+    def total(self) -> float:
+        return sum(self.timings.values())
+
+def compile_file(path: str, out_dir: str | None, emit: str) -> BatchResult:
+    """
+    Runs the Lexer, Parser, TypeChecker and Compiler over `path` and verifies the module with LLVM.
+    `emit` is "ir" to write a .ll file, one of `OUTPUT_KINDS` to build an object file, shared library or
+    executable, or "none" to only check the file.
+    Anything raised along the way is an error of the file, so one bad file cannot stop the rest of the batch
+    """
+    result: BatchResult = BatchResult(path)
+
+    try:
+        run_phases(result, out_dir, emit)
+    except Exception as e:
+        result.errors = [f"{type(e).__name__}: {e}"]
+
+    return result
+
+def run_phases(result: BatchResult, out_dir: str | None, emit: str) -> None:
+    """
+    Compiles `result.path` for `compile_file`, filling in `result` as each phase finishes
+    """
+    path: str = result.path
+
+    def timed(phase: str, fn, *args):
+        st = time.perf_counter()
+        value = fn(*args)
+        result.timings[phase] = time.perf_counter() - st
+        return value
+
+    tokens: TokenBuffer = timed("lex", TokenBuffer.from_lexer, Lexer(Path(path)))
+
+    p: Parser = Parser(lexer=tokens)
+    program: Program = timed("parse", p.parse_program)
+    if len(p.errors) > 0:
+        result.errors = p.errors
+        return
+
+    checker: TypeChecker = TypeChecker()
+    if not timed("check", checker.check, program):
+        result.errors = checker.errors
+        return
+
+    c: Compiler = Compiler()
+    timed("compile", c.compile, program)
+    if len(c.errors) > 0:
+        result.errors = c.errors
+        return
+
+    module: ir.Module = c.module
+    module.triple = llvm.get_default_triple()
+
+    llvm_ir_parsed = timed("parse_assembly", llvm.parse_assembly, str(module))
+    timed("verify", llvm_ir_parsed.verify)
+    # The target machine and passes of this worker were created by `ParallelCompiler.init_worker`
+    timed("optimize", ParallelCompiler.PIPELINE.run, llvm_ir_parsed, ParallelCompiler.TARGET_MACHINE)
+
+    if emit != "none" and out_dir is not None:
+        output: Path = Path(out_dir) / Path(path).with_suffix(".ll" if emit == "ir" else SUFFIXES[emit]).name
+
+        if emit == "ir":
+            timed("emit", lambda: output.write_text(str(llvm_ir_parsed)))
+        else:
+            timed("emit", build, llvm_ir_parsed, ParallelCompiler.TARGET_MACHINE, output, emit)
+
+        result.output = str(output)
+
+def collect_sources(paths: list[str]) -> list[str]:
+    """
+    Expands directories into the .trtl files inside them
+    """
+    sources: list[str] = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            sources.extend(str(p) for p in sorted(path.rglob("*.trtl")))
+        else:
+            sources.append(str(path))
+
+    return sources
+
+def compile_batch(paths: list[str], out_dir: str | None = None, emit: str = "none", workers: int | None = None, opt_level: int = 2) -> list[BatchResult]:
+    """
+    Compiles every file in `paths` across `workers` processes and returns the results in the same order
+    """
+    sources: list[str] = collect_sources(paths)
+
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=ParallelCompiler.init_worker, initargs=(opt_level,)) as pool:
+        return list(pool.map(compile_file, sources, [out_dir] * len(sources), [emit] * len(sources)))
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Compile many turtle script files in parallel")
+    arg_parser.add_argument("paths", nargs="+", help=".trtl files or directories containing them")
+    arg_parser.add_argument("-o", "--out-dir", default=None, help="directory to write the emitted files to")
+    arg_parser.add_argument("--emit", choices=["none", "ir", *OUTPUT_KINDS], default="none", help="what to write for each file")
+    arg_parser.add_argument("-j", "--workers", type=int, default=None, help="number of worker processes, defaults to the number of cores")
+    arg_parser.add_argument("-O", "--opt-level", type=int, choices=OPT_LEVELS, default=2, help="the LLVM optimization level")
+    args = arg_parser.parse_args()
+
+    st = time.perf_counter()
+    results: list[BatchResult] = compile_batch(args.paths, args.out_dir, args.emit, args.workers, args.opt_level)
+    et = time.perf_counter()
+
+    failed: int = 0
+    for result in results:
+        phases: str = "  ".join(f"{phase} {seconds * 1000:.2f}" for phase, seconds in result.timings.items())
+        if result.errors:
+            failed += 1
+            print(f"FAILED {result.path}")
+            for err in result.errors:
+                print(f"    {err}")
+        else:
+            print(f"OK     {result.path}  ({result.total() * 1000:.2f} ms: {phases})")
+
+    print(f"\n==== {len(results) - failed}/{len(results)} files compiled in {round((et - st) * 1000, 6)} ms. ====")
+    if failed > 0:
+        exit(1)
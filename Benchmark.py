@@ -0,0 +1,333 @@
+# Benchmark.py
+# This file measures how fast turtle script is compiled.
+# Run it with `python Benchmark.py lexer` or `python Benchmark.py phases --sizes 1KB,1MB`
+
+import argparse
+import gc
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from ctypes import CFUNCTYPE, c_int
+from datetime import datetime, timezone
+
+from llvmlite import ir
+import llvmlite
+import llvmlite.binding as llvm
+
+from Lexer import Lexer, LegacyLexer
+from Token import TokenType
+from TokenBuffer import TokenBuffer
+from Parser import Parser
+from TypeChecker import TypeChecker
+from Optimizer import optimize
+from Compiler import Compiler
+from PassPipeline import PassPipeline, OPT_LEVELS
+from AST import Program
+from Corpus import CORPUS_KINDS, generate_corpus
+from FlatAST import FlatAST
+from IncrementalParser import IncrementalParser
+
+# The phases of `bench_phases`, in the order they run
+PHASES: tuple[str, ...] = ("lex", "parse", "check", "optimize", "irgen", "parse_assembly", "verify", "llvm_opt", "mcjit", "execute")
+
+# The suffixes accepted by `parse_size`
+SIZE_UNITS: dict[str, int] = {"B": 1, "KB": 1024, "MB": 1024 ** 2, "GB": 1024 ** 3}
+
+def lex_all(lexer: Lexer | LegacyLexer) -> list:
+    """
+    Runs the lexer to the end and returns every token including the EOF token
+    """
+    tokens: list = []
+    next_token = lexer.next_token
+    eof: TokenType = TokenType.EOF
+    while True:
+        tok = next_token()
+        tokens.append(tok)
+        if tok.type is eof:
+            return tokens
+
+def time_lexer(lexer_class: type, source: str, repeat: int) -> tuple[float, list]:
+    """
+    Lexes `source` `repeat` times and returns the best time in seconds along with the tokens
+    """
+    best: float = float("inf")
+    tokens: list = []
+    for _ in range(repeat):
+        # The collector would otherwise run over the growing token list and skew the results
+        gc.disable()
+        st = time.perf_counter()
+        tokens = lex_all(lexer_class(source))
+        et = time.perf_counter()
+        gc.enable()
+        best = min(best, et - st)
+
+    return best, tokens
+
+def time_token_buffer(source: str, repeat: int) -> tuple[float, TokenBuffer]:
+    """
+    Fills a TokenBuffer from `source` `repeat` times and returns the best time in seconds along with the buffer
+    """
+    best: float = float("inf")
+    buffer: TokenBuffer = None
+    for _ in range(repeat):
+        gc.disable()
+        st = time.perf_counter()
+        buffer = TokenBuffer.from_lexer(Lexer(source))
+        et = time.perf_counter()
+        gc.enable()
+        best = min(best, et - st)
+
+    return best, buffer
+
+def bench_lexer(size_kb: int, repeat: int) -> None:
+    """
+    Compares the tokens per second of the `Lexer` and the `TokenBuffer` against the `LegacyLexer`
+    and checks they all produce the same tokens
+    """
+    source: str = generate_corpus(size_kb * 1024)
+
+    legacy_time, legacy_tokens = time_lexer(LegacyLexer, source, repeat)
+    new_time, new_tokens = time_lexer(Lexer, source, repeat)
+    buffer_time, buffer = time_token_buffer(source, repeat)
+
+    # The LegacyLexer put some tokens at their last character instead of their first, so positions are not compared
+    def key(tok) -> tuple:
+        return tok.type, tok.literal, tok.line_num
+
+    expected: list[tuple] = list(map(key, legacy_tokens))
+    if expected != list(map(key, new_tokens)):
+        raise AssertionError("Lexer and LegacyLexer produced different tokens")
+    if expected != [key(buffer.token(i)) for i in range(len(buffer))]:
+        raise AssertionError("TokenBuffer and LegacyLexer produced different tokens")
+
+    count: int = len(new_tokens)
+    token_bytes: int = sys.getsizeof(new_tokens[0]) + sys.getsizeof(new_tokens[0].literal)
+    buffer_bytes: int = sum(a.itemsize for a in (buffer.kinds, buffer.starts, buffer.ends, buffer.symbols))
+
+    print(f"==== LEXER BENCHMARK ({len(source) / 1024:.0f} KB, {count} tokens) ====")
+    print(f"LegacyLexer: {count / legacy_time:>14,.0f} tokens/s  ({legacy_time * 1000:.2f} ms)")
+    print(f"Lexer:       {count / new_time:>14,.0f} tokens/s  ({new_time * 1000:.2f} ms)  {legacy_time / new_time:.2f}x")
+    print(f"TokenBuffer: {count / buffer_time:>14,.0f} tokens/s  ({buffer_time * 1000:.2f} ms)  {legacy_time / buffer_time:.2f}x")
+    print(f"Memory per token: Token {token_bytes} bytes, TokenBuffer {buffer_bytes} bytes")
+
+def bench_reparse(size_kb: int, edits: int) -> None:
+    """
+    Compares parsing the whole file again against the IncrementalParser after small edits to one function
+    """
+    source: str = generate_corpus(size_kb * 1024)
+    incremental: IncrementalParser = IncrementalParser()
+    incremental.parse(source)
+
+    full_time: float = 0.0
+    incremental_time: float = 0.0
+    for n in range(edits):
+        # Change one constant in a different function each time
+        at: int = source.index("let total: int = ", len(source) * n // edits)
+        source = source[:at] + source[at:].replace("let total: int = ", "let total: int = 1 + ", 1)
+
+        st = time.perf_counter()
+        p: Parser = Parser(lexer=Lexer(source))
+        p.parse_program()
+        full_time += time.perf_counter() - st
+
+        st = time.perf_counter()
+        incremental.parse(source)
+        incremental_time += time.perf_counter() - st
+
+    print(f"==== REPARSE BENCHMARK ({len(source) / 1024:.0f} KB, {edits} edits) ====")
+    print(f"Parser:            {full_time / edits * 1000:>10.2f} ms per edit")
+    print(f"IncrementalParser: {incremental_time / edits * 1000:>10.2f} ms per edit  {full_time / incremental_time:.2f}x  ({incremental.reused} functions reused, {incremental.parsed} parsed)")
+
+def bench_ast(size_kb: int) -> None:
+    """
+    Compares the memory taken by the AST objects against the same AST in a FlatAST
+    """
+    tokens: TokenBuffer = TokenBuffer.from_lexer(Lexer(generate_corpus(size_kb * 1024)))
+
+    tracemalloc.start()
+    program: Program = Parser(lexer=tokens).parse_program()
+    tree_bytes: int = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    flat: FlatAST = FlatAST.from_program(program)
+    flat_bytes: int = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # Tracing slows every allocation down, so the times are taken separately
+    st = time.perf_counter()
+    flat = FlatAST.from_program(program)
+    flatten_time: float = time.perf_counter() - st
+
+    st = time.perf_counter()
+    flat.to_program()
+    rebuild_time: float = time.perf_counter() - st
+
+    count: int = len(flat)
+    print(f"==== AST BENCHMARK ({size_kb} KB, {count} nodes) ====")
+    print(f"AST objects: {tree_bytes / count:>8.1f} bytes per node  ({tree_bytes / 1024 ** 2:.2f} MB)")
+    print(f"FlatAST:     {flat_bytes / count:>8.1f} bytes per node  ({flat_bytes / 1024 ** 2:.2f} MB)  {tree_bytes / flat_bytes:.2f}x smaller")
+    print(f"Flattening took {flatten_time * 1000:.2f} ms, rebuilding the objects took {rebuild_time * 1000:.2f} ms")
+
+def parse_size(text: str) -> int:
+    """
+    Turns a size like "512", "64KB" or "100MB" into a number of bytes
+    """
+    text = text.strip().upper()
+    for unit in sorted(SIZE_UNITS, key=len, reverse=True):
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * SIZE_UNITS[unit])
+
+    return int(text)
+
+def git_commit() -> str | None:
+    """
+    Returns the commit being benchmarked, or None outside of a git checkout
+    """
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    return out.stdout.strip()
+
+def bench_phases(source: str, opt_level: int = 0) -> dict:
+    """
+    Compiles and runs `source` once, timing every phase in `PHASES` separately,
+    with the LLVM passes of `opt_level`. LLVM must already be initialized
+    """
+    timings: dict[str, float] = {}
+
+    def timed(phase: str, fn):
+        # The collector would otherwise run over the growing AST and skew the results
+        gc.disable()
+        st = time.perf_counter()
+        value = fn()
+        timings[phase] = time.perf_counter() - st
+        gc.enable()
+        return value
+
+    tokens: TokenBuffer = timed("lex", lambda: TokenBuffer.from_lexer(Lexer(source)))
+
+    p: Parser = Parser(lexer=tokens)
+    program: Program = timed("parse", p.parse_program)
+    if len(p.errors) > 0:
+        raise ValueError(f"The corpus did not parse: {p.errors[0]}")
+
+    checker: TypeChecker = TypeChecker()
+    if not timed("check", lambda: checker.check(program)):
+        raise ValueError(f"The corpus did not type check: {checker.errors[0]}")
+
+    program = timed("optimize", lambda: optimize(program))
+
+    c: Compiler = Compiler()
+
+    def irgen() -> str:
+        c.compile(node=program)
+        module: ir.Module = c.module
+        module.triple = llvm.get_default_triple()
+        return str(module)
+
+    ir_text: str = timed("irgen", irgen)
+    if len(c.errors) > 0:
+        raise ValueError(f"The corpus did not compile: {c.errors[0]}")
+
+    parsed: llvm.ModuleRef = timed("parse_assembly", lambda: llvm.parse_assembly(ir_text))
+    timed("verify", parsed.verify)
+
+    # The engine takes ownership of its target machine, so every run needs a new one
+    target_machine = llvm.Target.from_default_triple().create_target_machine(opt=opt_level)
+    timed("llvm_opt", lambda: PassPipeline(opt_level=opt_level).run(parsed, target_machine))
+
+    def mcjit() -> llvm.ExecutionEngine:
+        engine = llvm.create_mcjit_compiler(parsed, target_machine)
+        engine.finalize_object()
+        return engine
+
+    engine: llvm.ExecutionEngine = timed("mcjit", mcjit)
+    cfunc = CFUNCTYPE(c_int)(engine.get_function_address("main"))
+    result: int = timed("execute", cfunc)
+
+    return {
+        "bytes": len(source),
+        "tokens": len(tokens),
+        "functions": len(program.statements),
+        "ir_bytes": len(ir_text),
+        "result": result,
+        "timings": timings,
+        "total": sum(timings.values()),
+    }
+
+def bench_suite(sizes: list[int], kinds: list[str], depth: int, output: str | None, opt_level: int = 0) -> dict:
+    """
+    Runs `bench_phases` over a generated corpus for every size and kind, prints a table
+    and writes the results as JSON to `output`
+    """
+    llvm.initialize()
+    llvm.initialize_native_target()
+    llvm.initialize_native_asmprinter()
+
+    report: dict = {
+        "commit": git_commit(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "llvmlite": llvmlite.__version__,
+        "depth": depth,
+        "opt_level": opt_level,
+        "runs": [],
+    }
+
+    print(f"==== PHASE BENCHMARK (depth {depth}, -O{opt_level}) ====")
+    print(f"{'kind':<12}{'size':>10}" + "".join(f"{phase:>16}" for phase in PHASES) + f"{'total':>12}")
+    for kind in kinds:
+        for size in sizes:
+            source: str = generate_corpus(size, kind=kind, depth=depth)
+            run: dict = {"kind": kind, "size": size} | bench_phases(source, opt_level)
+            report["runs"].append(run)
+
+            timings: dict[str, float] = run["timings"]
+            print(f"{kind:<12}{size // 1024:>8}KB" + "".join(f"{timings[phase] * 1000:>14.2f}ms" for phase in PHASES) + f"{run['total']:>11.3f}s")
+
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=4)
+        print(f"Results written to {output}")
+
+    return report
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Benchmark the turtle script compiler")
+    commands = arg_parser.add_subparsers(dest="command", required=True)
+
+    lexer_parser = commands.add_parser("lexer", help="compare the Lexer and TokenBuffer against the LegacyLexer")
+    lexer_parser.add_argument("--size-kb", type=int, default=1024, help="size of the generated source in kilobytes")
+    lexer_parser.add_argument("--repeat", type=int, default=3, help="number of runs, the best one is reported")
+
+    reparse_parser = commands.add_parser("reparse", help="compare the IncrementalParser against parsing the whole file after each edit")
+    reparse_parser.add_argument("--size-kb", type=int, default=1024, help="size of the generated source in kilobytes")
+    reparse_parser.add_argument("--edits", type=int, default=10, help="number of edits, each one to a different function")
+
+    ast_parser = commands.add_parser("ast", help="compare the memory of the AST objects against a FlatAST")
+    ast_parser.add_argument("--size-kb", type=int, default=1024, help="size of the generated source in kilobytes")
+
+    phases_parser = commands.add_parser("phases", help="time every compiler phase over generated corpora")
+    phases_parser.add_argument("--sizes", default="1KB,64KB,1MB", help="comma separated corpus sizes, e.g. 1KB,10MB,100MB")
+    phases_parser.add_argument("--kinds", default="mixed", help=f"comma separated corpus kinds out of {', '.join(CORPUS_KINDS)}")
+    phases_parser.add_argument("--depth", type=int, default=24, help="nesting of the generated expressions and if/else chains")
+    phases_parser.add_argument("-O", "--opt-level", type=int, choices=OPT_LEVELS, default=0, help="the LLVM optimization level")
+    phases_parser.add_argument("-o", "--output", default="bench_output.json", help="the JSON file the results are written to")
+    args = arg_parser.parse_args()
+
+    match args.command:
+        case "lexer":
+            bench_lexer(args.size_kb, args.repeat)
+        case "ast":
+            bench_ast(args.size_kb)
+        case "reparse":
+            bench_reparse(args.size_kb, args.edits)
+        case "phases":
+            sizes: list[int] = [parse_size(size) for size in args.sizes.split(",")]
+            bench_suite(sizes, args.kinds.split(","), args.depth, args.output, args.opt_level)
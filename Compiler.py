@@ -2,17 +2,42 @@
 # This file defines the Compiler class
 from llvmlite import ir
 
-from AST import Node, NodeType, Program, Expression, Statement
+from AST import Node, NodeVisitor, Program, Expression
 from AST import ExpressionStatement, LetStatement, BlockStatement, FunctionStatement, ReturnStatement, AssignStatement, IfStatement
 from AST import InfixExpression, CallExpression
 from AST import IntegerLiteral, FloatLiteral, IdentifierLiteral, BooleanLiteral
 from AST import FunctionParameter
 
-from Environment import Environment
+from Resolver import Resolver
 
-class Compiler:
+# Bump this whenever a change to the Lexer, Parser, AST or Compiler changes what they produce,
+# so that nothing cached by an older version gets used
+COMPILER_VERSION: str = "0.2.0"
+
+# The IRBuilder method each arithmetic operator compiles to, by the type of its operands
+INSTRUCTIONS: dict[str, dict[str, str]] = {
+    'int': {'+': 'add', '-': 'sub', '*': 'mul', '/': 'sdiv', '%': 'srem'},
+    'float': {'+': 'fadd', '-': 'fsub', '*': 'fmul', '/': 'fdiv', '%': 'frem'},
+}
+
+# The comparison operators, which are their own predicate for both `icmp_signed` and `fcmp_ordered`
+COMPARISON_PREDICATES: tuple[str, ...] = ('<', '<=', '>', '>=', '==', '!=')
+
+class Compiler(NodeVisitor):
     """
-    A Compiler used to generate intemediate representation code called IR
+    A Compiler used to generate intemediate representation code called IR.
+    It is a NodeVisitor, so each node is compiled by its `visit_<node type>` method,
+    and expressions return their value and its type.
+
+    The Resolver binds every identifier to a `(depth, slot)` first, and the value and type
+    of each name are kept in `self.frames[depth][slot]`, one list for each open scope.
+
+    Variables are not kept in memory: the value in a variable's slot is the SSA value it was last given,
+    and where the branches of an `if` give a variable different values, a `phi` in the block after the `if`
+    picks the one of the branch that ran.
+
+    `compile_functions` builds each top-level function in a module of its own instead, declaring the functions
+    it calls from the other modules, so the modules can be optimized and code generated in parallel
     """
     def __init__(self) -> None:
         self.type_map: dict[str, ir.Type] = {
@@ -23,7 +48,7 @@ class Compiler:
 
         self.module: ir.Module = ir.Module('main')
         self.builder: ir.IRBuilder = ir.IRBuilder()
-        self.env : Environment = Environment()
+        self.frames: list[list[tuple[ir.Value, ir.Type] | None]] = []
 
         self.errors: list[str] = []
 
@@ -44,83 +69,70 @@ class Compiler:
 
             return true_var, false_var
         
-        true_var, false_var = __init_booleans()
-        self.env.define('true', true_var, true_var.type)
-        self.env.define('false', false_var, false_var.type)
+        __init_booleans()
 
     def compile(self, node: Node) -> None:
-        match node.type():
-            case NodeType.Program:
-                self.__visit_program(node)
-
-            # Statements
-            case NodeType.ExpressionStatement:
-                self.__visit_expression_statement(node)
-            case NodeType.LetStatement:
-                self.__visit_let_statement(node)
-            case NodeType.FunctionStatement:
-                self.__visit_function_statement(node)
-            case NodeType.BlockStatement:
-                self.__visit_block_statement(node)
-            case NodeType.ReturnStatement:
-                self.__visit_return_statement(node)
-            case NodeType.AssignStatement:
-                self.__visit_assign_statement(node)
-            case NodeType.IfStatement:
-                self.__visit_if_statement(node)
-
-            case NodeType.InfixExpression:
-                self.__visit_infix_expression(node)
-            case NodeType.CallExpression:
-                self.__visit_call_expression(node)
-            
+        # Every name is looked up once here, instead of walking the scopes each time it is used
+        Resolver().resolve(node)
+        self.visit(node)
+
+    def compile_functions(self, node: Program) -> list[ir.Module]:
+        """
+        Compiles `node` into `self.module`, which keeps the builtins, and one module for each top-level function
+        named after it, and returns them all with `self.module` first
+        """
+        Resolver().resolve(node)
+
+        main_module: ir.Module = self.module
+        modules: list[ir.Module] = [main_module]
+
+        self.frames = [[None] * node.frame_size]
+        for stmt in node.statements:
+            if isinstance(stmt, FunctionStatement):
+                self.module = ir.Module(f"main.{stmt.name.value}")
+                modules.append(self.module)
+            self.visit(stmt)
+            self.module = main_module
+
+        return modules
+
     # region Visit Methods
-    def __visit_program(self, node: Program) -> None:
+    def visit_program(self, node: Program) -> None:
+        self.frames = [[None] * node.frame_size]
         for stmt in node.statements:
-            self.compile(stmt)
+            self.visit(stmt)
 
 
     # region Statements
-    def __visit_expression_statement(self, node: ExpressionStatement) -> None:
-        self.compile(node.expr)  
+    def visit_expression_statement(self, node: ExpressionStatement) -> None:
+        self.visit(node.expr)  
 
-    def __visit_let_statement(self, node: LetStatement) -> None:
-        name: str = node.name.value
+    def visit_let_statement(self, node: LetStatement) -> None:
+        frame: list[tuple[ir.Value, ir.Type] | None] = self.frames[node.name.depth]
+        slot: int = node.name.slot
         value: Expression = node.value
         value_type: str = node.value_type
 
-        value, Type = self.__resolve_value(node=value)
-        
-        if self.env.lookup(name) is None:
-            # Define and allocate the value
-            ptr = self.builder.alloca(Type)
+        value, Type = self.visit(value)
 
-            # Storing the value to the ptr
-            self.builder.store(value, ptr)
-
-            # Add the variable to the environment
-            self.env.define(name, ptr, Type)
-        else:
-            ptr, _ = self.env.lookup(name)
-            self.builder.store(value, ptr)
+        # A `let` of a name that already has a slot gives that variable a new value, just like an assignment
+        frame[slot] = (value, Type)
     
-    def __visit_block_statement(self, node: BlockStatement) -> None:
+    def visit_block_statement(self, node: BlockStatement) -> None:
         for stmt in node.statements:
-            self.compile(stmt)
+            self.visit(stmt)
     
-    def __visit_return_statement(self, node: ReturnStatement) -> None:
+    def visit_return_statement(self, node: ReturnStatement) -> None:
         value: Expression = node.return_value
-        value, Type = self.__resolve_value(value)
+        value, Type = self.visit(value)
 
         self.builder.ret(value)
     
-    def __visit_function_statement(self, node: FunctionStatement) -> None:
+    def visit_function_statement(self, node: FunctionStatement) -> None:
         name: str = node.name.value
         body: BlockStatement = node.body
         params: list[FunctionParameter] = node.parameters
 
-        param_names: list[str] = [p.name for p in params]
-
         # Keep track of the types for each parameter
         param_types: list[ir.Type] = [self.type_map[p.value_type] for p in params]
 
@@ -135,143 +147,88 @@ class Compiler:
         
         self.builder = ir.IRBuilder(block)
 
-        # Storing the pointers to each parameter
-        params_ptr = []
-        for i, typ in enumerate(param_types):
-            ptr = self.builder.alloca(typ)
-            self.builder.store(func.args[i], ptr)
-            params_ptr.append(ptr)
-
-        # Adding the parameters to the environment
-        previous_env = self.env
+        for arg, p in zip(func.args, params):
+            arg.name = p.name
 
-        self.env = Environment(parent=previous_env)
-        for i, x in enumerate(zip(param_types, param_names)):
-            typ = param_types[i]
-            ptr = params_ptr[i]
+        # The function is in its slot before the body, so it can call itself
+        self.frames[node.name.depth][node.name.slot] = (func, return_type)
 
-            self.env.define(x[1], ptr, typ)
+        # The parameters take the first slots of the function's scope
+        frame: list[tuple[ir.Value, ir.Type] | None] = [None] * node.frame_size
+        frame[:len(params)] = zip(func.args, param_types)
+        self.frames.append(frame)
 
-        self.env.define(name, func, return_type)
-
-        self.compile(body)
-
-        self.env = previous_env
-        self.env.define(name, func, return_type)
+        self.visit(body)
 
+        self.frames.pop()
         self.builder = previous_builder
 
-    def __visit_assign_statement(self, node: AssignStatement) -> None:
+    def visit_assign_statement(self, node: AssignStatement) -> None:
         name: str = node.ident.value
         value: Expression = node.right_value
 
-        value, Type = self.__resolve_value(value)
+        value, Type = self.visit(value)
         
-        if self.env.lookup(name) is None:
+        if self.__lookup(node.ident) is None:
             self.errors.append(f"COMPILE ERROR: Identifier {name} has not been declared before it was re-assigned")
         else:
-            ptr, _ = self.env.lookup(name)
-            self.builder.store(value, ptr)
+            self.frames[node.ident.depth][node.ident.slot] = (value, Type)
     
-    def __visit_if_statement(self, node: IfStatement) -> None:
+    def visit_if_statement(self, node: IfStatement) -> None:
         condition = node.condition
         consequence = node.consequence
         alternative = node.alternative
 
-        test, _ = self.__resolve_value(condition)
+        test, _ = self.visit(condition)
+
+        frame: list[tuple[ir.Value, ir.Type] | None] = self.frames[-1]
+        before: list[tuple[ir.Value, ir.Type] | None] = frame.copy()
+
+        # The values of the variables at the end of each block that falls through to the block after the `if`
+        arms: list[tuple[list[tuple[ir.Value, ir.Type] | None], ir.Block]] = []
 
         if alternative is None:
+            arms.append((before, self.builder.block))
             with self.builder.if_then(test):
-                self.compile(consequence)
+                self.visit(consequence)
+                self.__end_arm(frame, arms)
         else:
             with self.builder.if_else(test) as (true, otherwise):
                 with true:
-                    self.compile(consequence)
+                    self.visit(consequence)
+                    self.__end_arm(frame, arms)
                 with otherwise:
-                    self.compile(alternative)
+                    frame[:] = before
+                    self.visit(alternative)
+                    self.__end_arm(frame, arms)
+
+        self.__merge(frame, arms)
                 
     # endregion
 
     # region Expressions
-    def __visit_infix_expression(self, node: InfixExpression) -> None:
+    def visit_infix_expression(self, node: InfixExpression) -> tuple[ir.Instruction, ir.Type]:
         operator: str = node.operator
-        left_value, left_type = self.__resolve_value(node.left_node)
-        right_value, right_type = self.__resolve_value(node.right_node)
-
-        value = None
-        Type = None
-        if isinstance(right_type, ir.IntType) and isinstance(left_type, ir.IntType):
-            Type = self.type_map['int']
-            match operator:
-                case '+':
-                    value = self.builder.add(left_value, right_value)
-                case '-':
-                    value = self.builder.sub(left_value, right_value)
-                case '*':
-                    value = self.builder.mul(left_value, right_value)
-                case '/':
-                    value = self.builder.sdiv(left_value, right_value)
-                case '%':
-                    value = self.builder.srem(left_value, right_value)
-                case '^':
-                    # TODO
-                    pass
-                case '<':
-                    value = self.builder.icmp_signed('<', left_value, right_value)
-                    Type = ir.IntType(1)
-                case '<=':
-                    value = self.builder.icmp_signed('<=', left_value, right_value)
-                    Type = ir.IntType(1)
-                case '>':
-                    value = self.builder.icmp_signed('>', left_value, right_value)
-                    Type = ir.IntType(1)
-                case '>=':
-                    value = self.builder.icmp_signed('>=', left_value, right_value)
-                    Type = ir.IntType(1)
-                case '==':
-                    value = self.builder.icmp_signed('==', left_value, right_value)
-                    Type = ir.IntType(1)
-                case '!=':
-                    value = self.builder.icmp_signed('!=', left_value, right_value)
-                    Type = ir.IntType(1)
-
-        if isinstance(right_type, ir.FloatType) and isinstance(left_type, ir.FloatType):
-            Type = self.type_map['float']
-            match operator:
-                case '+':
-                    value = self.builder.fadd(left_value, right_value)
-                case '-':
-                    value = self.builder.fsub(left_value, right_value)
-                case '*':
-                    value = self.builder.fmul(left_value, right_value)
-                case '/':
-                    value = self.builder.fdiv(left_value, right_value)
-                case '%':
-                    value = self.builder.frem(left_value, right_value)
-                case '^':
-                    # TODO
-                    pass
-                case '<':
-                    value = self.builder.fcmp_ordered('<', left_value, right_value)
-                    Type = ir.IntType(1)
-                case '<=':
-                    value = self.builder.fcmp_ordered('<=', left_value, right_value)
-                    Type = ir.IntType(1)
-                case '>':
-                    value = self.builder.fcmp_ordered('>', left_value, right_value)
-                    Type = ir.IntType(1)
-                case '>=':
-                    value = self.builder.fcmp_ordered('>=', left_value, right_value)
-                    Type = ir.IntType(1)
-                case '==':
-                    value = self.builder.fcmp_ordered('==', left_value, right_value)
-                    Type = ir.IntType(1)   
-                case '!=':
-                    value = self.builder.fcmp_ordered('!=', left_value, right_value)
-                    Type = ir.IntType(1)                
-        return value, Type
-
-    def __visit_call_expression(self, node: CallExpression) -> tuple[ir.Instruction, ir.Type]:
+        left_value, left_type = self.visit(node.left_node)
+        right_value, right_type = self.visit(node.right_node)
+
+        # The TypeChecker has already worked out the type of both sides, trees it has not seen fall back to the IR types
+        operand_type: str | None = node.left_node.resolved_type
+        if operand_type is None and left_type == right_type:
+            operand_type = self.__type_name(left_type)
+
+        if operand_type is not None and operator in COMPARISON_PREDICATES:
+            compare = self.builder.fcmp_ordered if operand_type == 'float' else self.builder.icmp_signed
+            return compare(operator, left_value, right_value), self.type_map['bool']
+
+        instruction: str | None = INSTRUCTIONS.get(operand_type, {}).get(operator)
+        if instruction is None:
+            self.errors.append(f"COMPILE ERROR: {operator} cannot be used on {left_type} and {right_type}")
+            return ir.Constant(left_type, ir.Undefined), left_type
+
+        return getattr(self.builder, instruction)(left_value, right_value), self.type_map[operand_type]
+
+    def visit_call_expression(self, node: CallExpression) -> tuple[ir.Instruction, ir.Type]:
         name: str = node.function.value
         params: list[Expression] = node.arguments
 
@@ -280,43 +237,83 @@ class Compiler:
         
         if len(params) > 0:
             for x in params:
-                p_val, p_type = self.__resolve_value(x)
+                p_val, p_type = self.visit(x)
                 args.append(p_val)
                 types.append(p_type)
 
         match name:
             case _:
-                func, ret_type = self.env.lookup(name)
+                func, ret_type = self.frames[node.function.depth][node.function.slot]
+                if func.module is not self.module:
+                    func = self.__declare(func)
                 ret = self.builder.call(func, args)
 
         return ret, ret_type
 
     # endregion
 
+    # region Helper Methods
+    def __end_arm(self, frame: list[tuple[ir.Value, ir.Type] | None], arms: list) -> None:
+        # A branch that returned does not reach the block after the `if`
+        if not self.builder.block.is_terminated:
+            arms.append((frame.copy(), self.builder.block))
+
+    def __merge(self, frame: list[tuple[ir.Value, ir.Type] | None], arms: list) -> None:
+        """
+        Sets each slot of `frame` to the value the variable has after the `if`, adding a `phi` to the block
+        the builder is in when the `arms` that reach it give the variable different values
+        """
+        if len(arms) == 0:
+            return
+
+        for slot in range(len(frame)):
+            values: list[tuple[ir.Value, ir.Type] | None] = [values[slot] for values, _ in arms]
+            first: tuple[ir.Value, ir.Type] | None = values[0]
+
+            if any(value is None for value in values):
+                # Declared in only one of the branches, so it cannot be used after the `if`
+                frame[slot] = None
+            elif all(value[0] is first[0] for value in values):
+                frame[slot] = first
+            else:
+                phi: ir.PhiInstr = self.builder.phi(first[1])
+                for (value, _), (_, block) in zip(values, arms):
+                    phi.add_incoming(value, block)
+                frame[slot] = (phi, first[1])
+
+    def __declare(self, func: ir.Function) -> ir.Function:
+        # A function defined in another module is called through a declaration of it in this one
+        declaration: ir.GlobalValue | None = self.module.globals.get(func.name)
+        if declaration is None:
+            declaration = ir.Function(self.module, func.function_type, name=func.name)
+        return declaration
+
+    def __lookup(self, node: IdentifierLiteral) -> tuple[ir.Value, ir.Type] | None:
+        if node.depth is None:
+            return None
+        return self.frames[node.depth][node.slot]
+
+    def __type_name(self, Type: ir.Type) -> str | None:
+        for name, t in self.type_map.items():
+            if t == Type:
+                return name
+        return None
     # endregion
 
-    # region Helper Methods
-    def __resolve_value(self, node: Expression, value_type: str = None) -> tuple[ir.Value, ir.Type]:
-        match node.type():
-            case NodeType.IntegerLiteral:
-               node: IntegerLiteral = node
-               value, Type = node.value, self.type_map['int' if value_type is None else value_type]
-               return ir.Constant(Type, value), Type
-            case NodeType.FloatLiteral:
-               node: FloatLiteral = node
-               value, Type = node.value, self.type_map['float' if value_type is None else value_type]
-               return ir.Constant(Type, value), Type
-            case NodeType.IdentifierLiteral:
-               node: IdentifierLiteral = node
-               ptr, Type = self.env.lookup(node.value)
-               return self.builder.load(ptr), Type
-            case NodeType.BooleanLiteral:
-               node: BooleanLiteral = node
-               return ir.Constant(ir.IntType(1), 1 if node.value else 0), ir.IntType(1)
-            # Expression Values
-            case NodeType.InfixExpression:
-                return self.__visit_infix_expression(node)
-            case NodeType.CallExpression:
-                return self.__visit_call_expression(node)            
-
-    # endregion
\ No newline at end of file
+    # region Literals
+    def visit_integer_literal(self, node: IntegerLiteral) -> tuple[ir.Constant, ir.Type]:
+        Type = self.type_map['int']
+        return ir.Constant(Type, node.value), Type
+
+    def visit_float_literal(self, node: FloatLiteral) -> tuple[ir.Constant, ir.Type]:
+        Type = self.type_map['float']
+        return ir.Constant(Type, node.value), Type
+
+    def visit_identifier_literal(self, node: IdentifierLiteral) -> tuple[ir.Value, ir.Type]:
+        return self.frames[node.depth][node.slot]
+
+    def visit_boolean_literal(self, node: BooleanLiteral) -> tuple[ir.Constant, ir.Type]:
+        return ir.Constant(ir.IntType(1), 1 if node.value else 0), ir.IntType(1)
+    # endregion
+
+    # endregion
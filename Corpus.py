@@ -0,0 +1,163 @@
+# Corpus.py
+# This file generates turtle script programs of any size for the benchmarks
+
+import random
+
+# The shapes of program the generator can produce
+CORPUS_KINDS: tuple[str, ...] = ("functions", "expressions", "branches", "mixed")
+
+# Functions only call the one before them inside a group, so the call chains at runtime stay short
+GROUP_SIZE: int = 64
+
+# The most calls `main` makes, one per group, so huge corpora still run quickly
+MAX_MAIN_CALLS: int = 256
+
+def letters(n: int) -> str:
+    """
+    Spells `n` with lowercase letters, since identifiers cannot contain digits
+    """
+    name: str = ""
+    while True:
+        n, digit = divmod(n, 26)
+        name = chr(ord('a') + digit) + name
+        if n == 0:
+            return name
+
+class CorpusGenerator:
+    """
+    Writes valid turtle script programs out of generated functions until they reach a size
+
+    Every function takes `(a: int, b: int) -> int`, only calls functions defined before it and only
+    divides by non-zero constants, so the programs compile, verify and run.
+
+    Attributes
+    ----------
+    kind : str
+        one of `CORPUS_KINDS`, "mixed" cycles through the others
+    depth : int
+        how deeply expressions nest and how long the `if`/`else` chains get
+    rng : random.Random
+        the seeded random generator, so the same arguments always give the same program
+    count : int
+        the number of functions written so far
+
+    Methods
+    ----------
+    def generate(self, size: int) -> str
+        Returns a program of at least `size` characters ending with a `main` function
+    """
+    def __init__(self, kind: str = "mixed", depth: int = 24, seed: int = 0) -> None:
+        if kind not in CORPUS_KINDS:
+            raise ValueError(f"Unknown corpus kind {kind}, expected one of {', '.join(CORPUS_KINDS)}")
+
+        self.kind = kind
+        self.depth = depth
+        self.rng = random.Random(seed)
+        self.count: int = 0
+
+    def generate(self, size: int) -> str:
+        chunks: list[str] = []
+        length: int = 0
+        while length < size:
+            chunk: str = self.__function()
+            chunks.append(chunk)
+            length += len(chunk)
+
+        chunks.append(self.__main())
+        return "".join(chunks)
+
+    # region Helpers
+    def __name(self, n: int) -> str:
+        return "fn" + letters(n)
+
+    def __function(self) -> str:
+        n: int = self.count
+        self.count += 1
+
+        kind: str = self.kind
+        if kind == "mixed":
+            kind = CORPUS_KINDS[n % 3]
+
+        match kind:
+            case "functions":
+                body: str = self.__small_body()
+            case "expressions":
+                body: str = self.__expression_body()
+            case "branches":
+                body: str = self.__branch_body()
+
+        # Call the previous function unless this one starts a new group
+        call: str = ""
+        if n % GROUP_SIZE != 0:
+            call = f"    total = total + {self.__name(n - 1)}(b, a % 97);\n"
+
+        return f"func {self.__name(n)}(a: int, b: int) -> int {{\n{body}{call}    return total;\n}}\n\n"
+
+    def __small_body(self) -> str:
+        rng = self.rng
+        return (
+            f"    let total: int = a * {rng.randint(1, 9)} + b;\n"
+            f"    let step: int = total % {rng.randint(2, 50)} - a;\n"
+            f"    total = total + step * {rng.randint(1, 9)};\n"
+        )
+
+    def __expression_body(self) -> str:
+        return f"    let total: int = {self.__expression(self.depth)};\n"
+
+    def __expression(self, depth: int) -> str:
+        """
+        Builds an expression with `depth` levels of nested parentheses
+        """
+        rng = self.rng
+        if depth == 0:
+            return rng.choice(("a", "b", str(rng.randint(1, 99))))
+
+        inner: str = self.__expression(depth - 1)
+        match rng.randrange(4):
+            case 0:
+                return f"({inner} + {rng.choice(('a', 'b'))})"
+            case 1:
+                return f"({inner} - {rng.randint(1, 99)}) * {rng.randint(1, 5)}"
+            case 2:
+                return f"({inner} / {rng.randint(1, 9)} + a % {rng.randint(2, 9)})"
+            case 3:
+                return f"(b * {rng.randint(1, 9)} - {inner})"
+
+    def __branch_body(self) -> str:
+        """
+        Builds a chain of `if`/`else` statements, each nested in the `else` of the one before it
+        """
+        rng = self.rng
+        lines: list[str] = ["    let total: int = a;\n"]
+        indent: str = "    "
+        for i in range(self.depth):
+            lines.append(f"{indent}if (total > {rng.randint(0, 1000)}) {{\n")
+            lines.append(f"{indent}    total = total - {rng.randint(1, 50)} * b;\n")
+            lines.append(f"{indent}}} else {{\n")
+            lines.append(f"{indent}    total = total + {i + 1};\n")
+            indent += "    "
+
+        for _ in range(self.depth):
+            indent = indent[:-4]
+            lines.append(f"{indent}}}\n")
+
+        return "".join(lines)
+
+    def __main(self) -> str:
+        """
+        Builds `main`, which calls the last function of each group
+        """
+        calls: list[str] = []
+        for n in range(min(self.count, GROUP_SIZE) - 1, self.count, GROUP_SIZE):
+            calls.append(f"    result = result + {self.__name(n)}({len(calls) + 1}, {n % 13});\n")
+            if len(calls) == MAX_MAIN_CALLS:
+                break
+
+        return f"func main() -> int {{\n    let result: int = 0;\n{''.join(calls)}    return result;\n}}\n"
+    # endregion
+
+def generate_corpus(size: int, kind: str = "mixed", depth: int = 24, seed: int = 0) -> str:
+    """
+    Returns a turtle script program of at least `size` characters, see `CorpusGenerator`
+    """
+    return CorpusGenerator(kind=kind, depth=depth, seed=seed).generate(size)
@@ -0,0 +1,191 @@
+# DebugWriter.py
+# This file implements a DebugWriter that writes the debug AST and IR files on a background thread
+
+import queue
+import threading
+from json.encoder import encode_basestring_ascii
+from typing import Any, Callable, TextIO
+
+from AST import Node, NodeType, Program
+
+# The keys `Node.data()` gives each kind of node after "type", with the attribute each one is read from
+FIELDS: dict[NodeType, tuple[tuple[str, str], ...]] = {
+    NodeType.FunctionParameter: (("name", "name"), ("value_type", "value_type")),
+    NodeType.ExpressionStatement: (("expr", "expr"),),
+    NodeType.LetStatement: (("expr", "name"), ("value", "value"), ("value_type", "value_type")),
+    NodeType.BlockStatement: (("statements", "statements"),),
+    NodeType.ReturnStatement: (("return_value", "return_value"),),
+    NodeType.FunctionStatement: (("name", "name"), ("return_type", "return_type"), ("parameters", "parameters"), ("body", "body")),
+    NodeType.AssignStatement: (("ident", "ident"), ("right_value", "right_value")),
+    NodeType.IfStatement: (("condition", "condition"), ("consequence", "consequence"), ("alternative", "alternative")),
+    NodeType.InfixExpression: (("left_node", "left_node"), ("operator", "operator"), ("right_node", "right_node")),
+    NodeType.CallExpression: (("function", "function"), ("arguments", "arguments")),
+    NodeType.IntegerLiteral: (("value", "value"),),
+    NodeType.FloatLiteral: (("value", "value"),),
+    NodeType.IdentifierLiteral: (("value", "value"),),
+    NodeType.BooleanLiteral: (("value", "value"),),
+}
+
+# How many pieces of JSON are joined before they are written to the file
+WRITE_BATCH: int = 4096
+
+# How many characters of IR are written at a time
+IR_CHUNK_SIZE: int = 1024 * 1024
+
+def encode_scalar(value: Any) -> str:
+    """
+    Encodes a value that is not a container the same way `json.dump` does
+    """
+    if isinstance(value, str):
+        return encode_basestring_ascii(value)
+    elif value is None:
+        return "null"
+    elif value is True:
+        return "true"
+    elif value is False:
+        return "false"
+    elif isinstance(value, int):
+        return int.__repr__(value)
+    elif isinstance(value, float):
+        if value != value:
+            return "NaN"
+        elif value == float("inf"):
+            return "Infinity"
+        elif value == float("-inf"):
+            return "-Infinity"
+        return float.__repr__(value)
+
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def node_items(node: Node | dict) -> list[tuple[str, Any]]:
+    """
+    Returns the keys and values `node.data()` would have, with the child nodes left as nodes
+    """
+    if isinstance(node, dict):
+        return list(node.items())
+    elif node.type() == NodeType.Program:
+        # The Program wraps every statement in a dictionary keyed by its type
+        return [("type", NodeType.Program.value), ("statements", [{stmt.type().value: stmt} for stmt in node.statements])]
+
+    return [("type", node.type().value), *((key, getattr(node, attr)) for key, attr in FIELDS[node.type()])]
+
+def write_ast_json(program: Program, f: TextIO, indent: int = 4) -> None:
+    """
+    Writes `program` to `f` exactly as `json.dump(program.data(), f, indent=indent)` would, but walks
+    the tree with an explicit stack instead of building the nested dictionaries first.
+    Children that are None are written as null, where `data()` would fail
+    """
+    pieces: list[str] = []
+    write: Callable = pieces.append
+
+    # Each entry is an open object or array: its items, whether it is an object, its indent level and
+    # whether its first item is still to come
+    stack: list[list] = []
+
+    def open_value(value: Any, level: int) -> None:
+        if isinstance(value, (Node, dict)):
+            write("{")
+            stack.append([iter(node_items(value)), True, level + 1, True])
+        elif isinstance(value, list) and len(value) > 0:
+            write("[")
+            stack.append([iter(value), False, level + 1, True])
+        elif isinstance(value, list):
+            write("[]")
+        else:
+            write(encode_scalar(value))
+
+    open_value(program, 0)
+    while len(stack) > 0:
+        frame: list = stack[-1]
+        items, is_object, level, first = frame
+
+        # `stack` stands in for the end of the items, since it can never be one of them
+        item: Any = next(items, stack)
+        if item is stack:
+            stack.pop()
+            write("\n" + " " * (indent * (level - 1)) + ("}" if is_object else "]"))
+            continue
+
+        write(("\n" if first else ",\n") + " " * (indent * level))
+        frame[3] = False
+
+        if is_object:
+            key, item = item
+            write(encode_basestring_ascii(key) + ": ")
+        open_value(item, level)
+
+        if len(pieces) >= WRITE_BATCH:
+            f.write("".join(pieces))
+            pieces.clear()
+
+    f.write("".join(pieces))
+
+def write_ir(text: str, f: TextIO) -> None:
+    """
+    Writes the IR `text` `IR_CHUNK_SIZE` characters at a time
+    """
+    for start in range(0, len(text), IR_CHUNK_SIZE):
+        f.write(text[start:start + IR_CHUNK_SIZE])
+
+class DebugWriter:
+    """
+    A DebugWriter writes the debug files on one background thread, in the order they were asked for,
+    so the compiler carries on while they are written. The LLVM calls in llvmlite release the GIL, so most
+    of the writing overlaps with parsing, verifying and compiling the IR. A Program that was handed to the
+    writer must not be changed until the writer is closed.
+
+    Attributes
+    ----------
+    errors : list[Exception]
+        the errors raised while writing
+
+    Methods
+    ----------
+    def write_ast(self, program: Program, path: str) -> None:
+        writes `program` to `path` as JSON
+
+    def write_ir(self, text: str, path: str) -> None:
+        writes the IR `text` to `path`
+
+    def close(self) -> None:
+        waits for every write to finish, then raises the first error if there was one
+    """
+    def __init__(self) -> None:
+        self.errors: list[Exception] = []
+
+        self.__queue: queue.Queue = queue.Queue()
+        self.__thread: threading.Thread = threading.Thread(target=self.__run, name="DebugWriter", daemon=True)
+        self.__thread.start()
+
+    def __enter__(self) -> "DebugWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __run(self) -> None:
+        while True:
+            job = self.__queue.get()
+            if job is None:
+                return
+
+            write, value, path = job
+            try:
+                with open(path, "w", buffering=IR_CHUNK_SIZE) as f:
+                    write(value, f)
+            except Exception as e:
+                self.errors.append(e)
+
+    def write_ast(self, program: Program, path: str) -> None:
+        self.__queue.put((write_ast_json, program, path))
+
+    def write_ir(self, text: str, path: str) -> None:
+        self.__queue.put((write_ir, text, path))
+
+    def close(self) -> None:
+        if self.__thread.is_alive():
+            self.__queue.put(None)
+            self.__thread.join()
+
+        if len(self.errors) > 0:
+            raise self.errors[0]
@@ -1,5 +1,7 @@
 # Environment.py
-# This file defines an Environment class
+# This file defines the Environment classes
+from typing import Any
+
 from llvmlite import ir
 
 class Environment:
@@ -8,8 +10,8 @@ class Environment:
 
     Attributes
     ----------
-    records: dict[str, tuple[ir.Value, ir.Type]]
-        records is a dictionary that maps variable names to a tuple of the value and type
+    records: dict[int, tuple[ir.Value, ir.Type]]
+        records is a dictionary that maps the `SYMBOL_TABLE` id of each variable name to a tuple of the value and type
     parent : Environment | None
         a reference to the parent Environment
     name: str
@@ -17,34 +19,160 @@ class Environment:
 
     Methods
     ----------
-    def define(self, name: str, value: ir.Value, __type: ir.Type) -> None:
+    def define(self, symbol: int, value: ir.Value, __type: ir.Type) -> None:
         defines the variable in the Environment
 
-    def lookup(self, name: str) -> tuple[ir.Value, ir.Type]:
+    def lookup(self, symbol: int) -> tuple[ir.Value, ir.Type]:
         returns the mapping from the dictionary
 
-    def __resolve(self, name: str) -> tuple[ir.Value, ir.Type]:
+    def __resolve(self, symbol: int) -> tuple[ir.Value, ir.Type]:
         returns the mapping from the current environment and all of its parent environments
     
     """
-    def __init__(self, records: dict[str, tuple[ir.Value, ir.Type]] = None, parent = None, name : str  = "global") -> None:
-       self.records: dict[str, tuple[ir.Value, ir.Type]] = records if records else {}
+    def __init__(self, records: dict[int, tuple[ir.Value, ir.Type]] = None, parent = None, name : str  = "global") -> None:
+       self.records: dict[int, tuple[ir.Value, ir.Type]] = records if records else {}
        self.parent : Environment | None = parent
        self.name : str = name
 
-    def define(self, name: str, value: ir.Value, __type: ir.Type) -> ir.Value:
-        self.records[name] = (value, __type)
+    def define(self, symbol: int, value: ir.Value, __type: ir.Type) -> ir.Value:
+        self.records[symbol] = (value, __type)
         return value
 
-    def lookup(self, name: str) -> tuple[ir.Value, ir.Type]:
-        return self.__resolve(name)
+    def lookup(self, symbol: int) -> tuple[ir.Value, ir.Type]:
+        return self.__resolve(symbol)
 
-    def __resolve(self, name: str) -> tuple[ir.Value, ir.Type]:
-        if name in self.records:
-            return self.records[name]
+    def __resolve(self, symbol: int) -> tuple[ir.Value, ir.Type]:
+        if symbol in self.records:
+            return self.records[symbol]
         elif self.parent:
-            return self.parent.__resolve(name)
+            return self.parent.__resolve(symbol)
         else:
             return None
         
-            
\ No newline at end of file
+            
+# Each level of a SymbolMap trie uses this many bits of the symbol id, so a node has 2 ** BITS children
+BITS: int = 5
+WIDTH: int = 1 << BITS
+MASK: int = WIDTH - 1
+
+class SymbolMap:
+    """
+    A SymbolMap is an immutable map from `SYMBOL_TABLE` ids to values. Symbol ids are small and dense, so it is a
+    trie of tuples indexed by `BITS` bits of the id at a time, like a persistent vector. `set` copies only the nodes
+    on the path to the symbol, at most 4 tuples of `WIDTH` for a million symbols, and shares the rest with the old map,
+    which stays as it was. A value of None means the symbol is not in the map.
+
+    Attributes
+    ----------
+    root : tuple | None
+        the top node of the trie
+    shift : int
+        how far the id is shifted right to index the top node, the trie holds ids below `1 << (shift + BITS)`
+
+    Methods
+    ----------
+    def get(self, symbol: int) -> Any:
+        returns the value of `symbol`, or None
+
+    def set(self, symbol: int, value: Any) -> SymbolMap:
+        returns a map with `symbol` set to `value`
+    """
+    __slots__ = ("root", "shift")
+
+    def __init__(self, root: tuple | None = None, shift: int = 0) -> None:
+        self.root: tuple | None = root
+        self.shift: int = shift
+
+    def get(self, symbol: int) -> Any:
+        shift: int = self.shift
+        if symbol >> (shift + BITS):
+            return None
+
+        node: tuple | None = self.root
+        while node is not None and shift > 0:
+            node = node[(symbol >> shift) & MASK]
+            shift -= BITS
+
+        return node[symbol & MASK] if node is not None else None
+
+    def set(self, symbol: int, value: Any) -> "SymbolMap":
+        root: tuple | None = self.root
+        shift: int = self.shift
+
+        # Add levels on top until the id fits, the old trie becomes the first child of the new top node
+        while symbol >> (shift + BITS):
+            if root is not None:
+                root = (root,) + (None,) * (WIDTH - 1)
+            shift += BITS
+
+        return SymbolMap(self.__set(root, shift, symbol, value), shift)
+
+    @staticmethod
+    def __set(node: tuple | None, shift: int, symbol: int, value: Any) -> tuple:
+        children: list = list(node) if node is not None else [None] * WIDTH
+        index: int = (symbol >> shift) & MASK
+
+        if shift == 0:
+            children[index] = value
+        else:
+            children[index] = SymbolMap.__set(children[index], shift - BITS, symbol, value)
+
+        return tuple(children)
+
+# The map with nothing in it, which every PersistentEnvironment starts from
+EMPTY_SYMBOL_MAP: SymbolMap = SymbolMap()
+
+class PersistentEnvironment:
+    """
+    A PersistentEnvironment is an Environment that never changes: `define` and `child` return a new one and share
+    everything else with the old one, so keeping a snapshot of a scope is O(1) and a snapshot stays valid whatever
+    is defined afterwards. Returning to the scope an `if` branch or a function body started in is just going back
+    to the environment from before it, and one environment can be read by many threads at once.
+
+    `records` holds every name visible from the scope, including the ones of the enclosing scopes, so a lookup is
+    one SymbolMap lookup however deeply the scopes nest.
+
+    Attributes
+    ----------
+    records : SymbolMap
+        the value and type of every visible name
+    defined : SymbolMap
+        True for each name defined in this scope itself
+    parent : PersistentEnvironment | None
+        the enclosing scope
+    name : str
+        the name of the scope
+
+    Methods
+    ----------
+    def define(self, symbol: int, value: Any, __type: Any) -> PersistentEnvironment:
+        returns the environment with the variable defined in this scope
+
+    def lookup(self, symbol: int) -> tuple[Any, Any] | None:
+        returns the value and type of the name, from this scope or an enclosing one
+
+    def is_local(self, symbol: int) -> bool:
+        returns whether the name is defined in this scope itself
+
+    def child(self, name: str) -> PersistentEnvironment:
+        returns a new scope enclosed by this one
+    """
+    __slots__ = ("records", "defined", "parent", "name")
+
+    def __init__(self, records: SymbolMap = EMPTY_SYMBOL_MAP, defined: SymbolMap = EMPTY_SYMBOL_MAP, parent = None, name: str = "global") -> None:
+        self.records: SymbolMap = records
+        self.defined: SymbolMap = defined
+        self.parent: PersistentEnvironment | None = parent
+        self.name: str = name
+
+    def define(self, symbol: int, value: Any, __type: Any) -> "PersistentEnvironment":
+        return PersistentEnvironment(self.records.set(symbol, (value, __type)), self.defined.set(symbol, True), self.parent, self.name)
+
+    def lookup(self, symbol: int) -> tuple[Any, Any] | None:
+        return self.records.get(symbol)
+
+    def is_local(self, symbol: int) -> bool:
+        return self.defined.get(symbol) is not None
+
+    def child(self, name: str) -> "PersistentEnvironment":
+        return PersistentEnvironment(self.records, EMPTY_SYMBOL_MAP, self, name)
@@ -0,0 +1,307 @@
+# FlatAST.py
+# This file defines FlatAST, a compact copy of an AST where the nodes are integer ids into typed arrays
+
+import marshal
+from array import array
+from typing import Any, Callable, Iterator
+
+from SymbolTable import SYMBOL_TABLE
+from AST import Node, NodeType, Program
+from AST import ExpressionStatement, LetStatement, FunctionStatement, ReturnStatement, BlockStatement, AssignStatement, IfStatement
+from AST import InfixExpression, CallExpression
+from AST import IntegerLiteral, FloatLiteral, IdentifierLiteral, BooleanLiteral
+from AST import FunctionParameter
+
+# Every NodeType in a fixed order, so a node's type can be stored as a small integer kind
+NODE_TYPES: list[NodeType] = list(NodeType)
+NODE_KINDS: dict[NodeType, int] = {nt: kind for kind, nt in enumerate(NODE_TYPES)}
+
+# The kind of the extra nodes that hold a list which can also be None, like the arguments of a call
+LIST_KIND: int = len(NODE_TYPES)
+
+# The id standing in for a child or literal that is None
+NONE: int = -1
+
+class FlatAST:
+    """
+    A FlatAST stores a whole program as a struct of arrays. Every node is an integer id, its children
+    are the ids in `children[child_starts[id]:child_starts[id + 1]]` and its literal is an index into
+    `constants`, or a `SYMBOL_TABLE` id for identifiers. Children always get a smaller id than their
+    parent, so a pass that walks the ids in order sees the children of a node before the node itself.
+
+    The children of each kind of node, in order:
+        Program, BlockStatement         the statements
+        ExpressionStatement             the expression
+        LetStatement                    the name and the value, the literal is the value type
+        ReturnStatement                 the return value
+        FunctionStatement               the name, the body and a list of parameters, the literal is the return type
+        AssignStatement                 the identifier and the value
+        IfStatement                     the condition, the consequence and the alternative
+        InfixExpression                 the left and right nodes, the literal is the operator
+        CallExpression                  the function and a list of arguments
+        FunctionParameter               the name as an IdentifierLiteral, the literal is the value type
+        the other literals              none, the literal is the value
+
+    Attributes
+    ----------
+    kinds : array('B')
+        the kind of each node, an index into `NODE_TYPES` or `LIST_KIND`
+    literals : array('i')
+        the literal of each node, `NONE` when it has none
+    child_starts : array('I')
+        where the children of each node start in `children`, with one extra entry for the end of the last node
+    children : array('i')
+        the child ids of every node one after the other, `NONE` for a child that is None
+    constants : list[Any]
+        the distinct literal values, so the same type, operator or number is only stored once
+    root : int
+        the id of the Program
+
+    Methods
+    ----------
+    def from_program(cls, program: Program) -> FlatAST:
+        flattens `program`
+
+    def type(self, node: int) -> NodeType | None:
+        returns the NodeType of `node`, None for a list
+
+    def children_of(self, node: int) -> array:
+        returns the child ids of `node`
+
+    def literal(self, node: int) -> Any:
+        returns the literal of `node`
+
+    def nodes(self, node_type: NodeType) -> Iterator[int]:
+        yields the id of every node of `node_type`
+
+    def to_program(self) -> Program:
+        builds the AST back out of the arrays
+
+    def to_bytes(self) -> bytes:
+        serializes the arrays, constants and symbol names
+
+    def from_bytes(cls, data: bytes) -> FlatAST:
+        loads a FlatAST serialized by `to_bytes`
+    """
+    def __init__(self) -> None:
+        self.kinds: array = array('B')
+        self.literals: array = array('i')
+        self.child_starts: array = array('I', [0])
+        self.children: array = array('i')
+        self.constants: list[Any] = []
+        self.root: int = NONE
+
+        # The index of each constant by its type and value, as 1, 1.0 and True are equal keys on their own
+        self.__constant_ids: dict[tuple[type, Any], int] = {}
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    @classmethod
+    def from_program(cls, program: Program) -> "FlatAST":
+        """
+        Flattens `program` with an explicit stack, so deeply nested expressions cost no Python frames
+        """
+        flat: FlatAST = cls()
+
+        # Each entry is a node (or list) to visit, or a finished node waiting for the ids of its children
+        stack: list[tuple[bool, Any]] = [(False, program)]
+        ids: list[int] = []
+        while len(stack) > 0:
+            done, item = stack.pop()
+            if done:
+                kind, literal, count = item
+                first: int = len(ids) - count
+                flat.__add(kind, literal, ids[first:])
+                del ids[first:]
+                ids.append(len(flat.kinds) - 1)
+                continue
+
+            if item is None:
+                ids.append(NONE)
+                continue
+
+            kind, literal, children = flat.__parts(item)
+            stack.append((True, (kind, literal, len(children))))
+            stack.extend((False, child) for child in reversed(children))
+
+        flat.root = ids.pop()
+        return flat
+
+    def __parts(self, item: Node | list) -> tuple[int, int, list]:
+        """
+        Returns the kind, literal and children of `item`, see the table in the class docstring
+        """
+        if isinstance(item, list):
+            return LIST_KIND, NONE, item
+
+        match item.type():
+            case NodeType.Program | NodeType.BlockStatement:
+                return NODE_KINDS[item.type()], NONE, item.statements
+            case NodeType.ExpressionStatement:
+                return NODE_KINDS[NodeType.ExpressionStatement], NONE, [item.expr]
+            case NodeType.LetStatement:
+                return NODE_KINDS[NodeType.LetStatement], self.__constant(item.value_type), [item.name, item.value]
+            case NodeType.ReturnStatement:
+                return NODE_KINDS[NodeType.ReturnStatement], NONE, [item.return_value]
+            case NodeType.FunctionStatement:
+                return NODE_KINDS[NodeType.FunctionStatement], self.__constant(item.return_type), [item.name, item.body, item.parameters]
+            case NodeType.AssignStatement:
+                return NODE_KINDS[NodeType.AssignStatement], NONE, [item.ident, item.right_value]
+            case NodeType.IfStatement:
+                return NODE_KINDS[NodeType.IfStatement], NONE, [item.condition, item.consequence, item.alternative]
+            case NodeType.InfixExpression:
+                return NODE_KINDS[NodeType.InfixExpression], self.__constant(item.operator), [item.left_node, item.right_node]
+            case NodeType.CallExpression:
+                return NODE_KINDS[NodeType.CallExpression], NONE, [item.function, item.arguments]
+            case NodeType.FunctionParameter:
+                return NODE_KINDS[NodeType.FunctionParameter], self.__constant(item.value_type), [IdentifierLiteral(item.name, item.symbol)]
+            case NodeType.IdentifierLiteral:
+                return NODE_KINDS[NodeType.IdentifierLiteral], NONE if item.symbol is None else item.symbol, []
+            case _:
+                return NODE_KINDS[item.type()], self.__constant(item.value), []
+
+    def __constant(self, value: Any) -> int:
+        key: tuple[type, Any] = (type(value), value)
+        index: int | None = self.__constant_ids.get(key)
+        if index is None:
+            index = len(self.constants)
+            self.constants.append(value)
+            self.__constant_ids[key] = index
+
+        return index
+
+    def __add(self, kind: int, literal: int, children) -> None:
+        self.kinds.append(kind)
+        self.literals.append(literal)
+        self.children.extend(children)
+        self.child_starts.append(len(self.children))
+
+    def to_bytes(self) -> bytes:
+        """
+        Serializes the FlatAST with `marshal`. Symbol ids are only valid in this process, so the names of the
+        symbols are stored along with them
+        """
+        return marshal.dumps((
+            self.root,
+            self.constants,
+            SYMBOL_TABLE.names,
+            self.kinds.tobytes(),
+            self.literals.tobytes(),
+            self.child_starts.tobytes(),
+            self.children.tobytes(),
+        ))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "FlatAST":
+        """
+        Loads the output of `to_bytes`, interning its symbol names and renumbering the identifiers when
+        this process gave them different ids. Raises a ValueError when `data` is not a FlatAST
+        """
+        try:
+            root, constants, names, kinds, literals, child_starts, children = marshal.loads(data)
+        except (EOFError, TypeError) as e:
+            raise ValueError("Not a serialized FlatAST") from e
+
+        flat: FlatAST = cls()
+        flat.root = root
+        flat.constants = constants
+        flat.kinds.frombytes(kinds)
+        flat.literals.frombytes(literals)
+        flat.child_starts = array('I')
+        flat.child_starts.frombytes(child_starts)
+        flat.children.frombytes(children)
+
+        symbols: list[int] = [SYMBOL_TABLE.intern(name) for name in names]
+        if symbols != list(range(len(symbols))):
+            identifier: int = NODE_KINDS[NodeType.IdentifierLiteral]
+            literals: array = flat.literals
+            for node, kind in enumerate(flat.kinds):
+                if kind == identifier and literals[node] != NONE:
+                    literals[node] = symbols[literals[node]]
+
+        return flat
+
+    def type(self, node: int) -> NodeType | None:
+        kind: int = self.kinds[node]
+        return NODE_TYPES[kind] if kind != LIST_KIND else None
+
+    def children_of(self, node: int) -> array:
+        return self.children[self.child_starts[node]:self.child_starts[node + 1]]
+
+    def literal(self, node: int) -> Any:
+        """
+        Returns the value, type or operator of `node`, or the name of an IdentifierLiteral
+        """
+        literal: int = self.literals[node]
+        if literal == NONE:
+            return None
+        elif self.kinds[node] == NODE_KINDS[NodeType.IdentifierLiteral]:
+            return SYMBOL_TABLE.name(literal)
+
+        return self.constants[literal]
+
+    def nodes(self, node_type: NodeType) -> Iterator[int]:
+        """
+        Yields the id of every node of `node_type`, children before their parents
+        """
+        kind: int = NODE_KINDS[node_type]
+        for node, k in enumerate(self.kinds):
+            if k == kind:
+                yield node
+
+    def to_program(self) -> Program:
+        """
+        Builds the AST back, one node per id in order, since the children of a node are always built before it
+        """
+        # The extra None at the end of both lists is what a `NONE` (-1) index reads
+        built: list[Any] = [None] * (len(self.kinds) + 1)
+        constants: list[Any] = self.constants + [None]
+        builders: list[Callable] = self.__builders()
+
+        starts: array = self.child_starts
+        children: array = self.children
+        for node, (kind, literal, start, end) in enumerate(zip(self.kinds, self.literals, starts, starts[1:])):
+            built[node] = builders[kind](constants, literal, [built[i] for i in children[start:end]])
+
+        return built[self.root]
+
+    @staticmethod
+    def __builders() -> list[Callable]:
+        """
+        Returns a function for each kind that builds a node out of the constants, its literal and its children
+        """
+        def program(constants: list, literal: int, nodes: list) -> Program:
+            node: Program = Program()
+            node.statements = nodes
+            return node
+
+        def function(constants: list, literal: int, nodes: list) -> FunctionStatement:
+            node: FunctionStatement = FunctionStatement(None, nodes[1], nodes[0], constants[literal])
+            node.parameters = nodes[2]
+            return node
+
+        def identifier(constants: list, literal: int, nodes: list) -> IdentifierLiteral:
+            if literal == NONE:
+                return IdentifierLiteral()
+            return IdentifierLiteral(SYMBOL_TABLE.name(literal), literal)
+
+        builders: dict[NodeType, Callable] = {
+            NodeType.Program: program,
+            NodeType.BlockStatement: lambda constants, literal, nodes: BlockStatement(nodes),
+            NodeType.ExpressionStatement: lambda constants, literal, nodes: ExpressionStatement(nodes[0]),
+            NodeType.LetStatement: lambda constants, literal, nodes: LetStatement(nodes[0], nodes[1], constants[literal]),
+            NodeType.ReturnStatement: lambda constants, literal, nodes: ReturnStatement(nodes[0]),
+            NodeType.FunctionStatement: function,
+            NodeType.AssignStatement: lambda constants, literal, nodes: AssignStatement(nodes[0], nodes[1]),
+            NodeType.IfStatement: lambda constants, literal, nodes: IfStatement(nodes[0], nodes[1], nodes[2]),
+            NodeType.InfixExpression: lambda constants, literal, nodes: InfixExpression(nodes[0], constants[literal], nodes[1]),
+            NodeType.CallExpression: lambda constants, literal, nodes: CallExpression(nodes[0], nodes[1]),
+            NodeType.FunctionParameter: lambda constants, literal, nodes: FunctionParameter(nodes[0].value, constants[literal], nodes[0].symbol),
+            NodeType.IdentifierLiteral: identifier,
+            NodeType.IntegerLiteral: lambda constants, literal, nodes: IntegerLiteral(constants[literal]),
+            NodeType.FloatLiteral: lambda constants, literal, nodes: FloatLiteral(constants[literal]),
+            NodeType.BooleanLiteral: lambda constants, literal, nodes: BooleanLiteral(constants[literal]),
+        }
+
+        return [builders[nt] for nt in NODE_TYPES] + [lambda constants, literal, nodes: nodes]
@@ -0,0 +1,108 @@
+# IncrementalParser.py
+# This file implements an IncrementalParser that only reparses the top-level functions that changed since the last parse
+
+import hashlib
+import re
+
+from LineIndex import LineIndex
+from Parser import Parser
+from TokenBuffer import TokenBuffer
+from AST import Statement, Program
+
+# Matches the `func` keyword that starts the next top-level function
+FUNC_START: re.Pattern = re.compile(r"[ \t\r\n]*func(?![^\W\d])")
+
+def function_spans(source: str) -> list[tuple[int, int]]:
+    """
+    Splits `source` into spans that each end with the closing brace of a top-level function and are followed
+    by the next `func`, the last span runs to the end of `source`. There are no strings or comments in
+    turtle script, so every brace character in the source is a brace token
+    """
+    spans: list[tuple[int, int]] = []
+    start: int = 0
+    depth: int = 0
+
+    for match in re.finditer(r"[{}]", source):
+        if match.group() == "{":
+            depth += 1
+            continue
+
+        depth -= 1
+        if depth == 0 and FUNC_START.match(source, match.end()):
+            spans.append((start, match.end()))
+            start = match.end()
+
+    spans.append((start, len(source)))
+    return spans
+
+class IncrementalParser:
+    """
+    An IncrementalParser parses the same file over and over as it is edited. It splits the file into its
+    top-level functions and keeps the statements of each one in a cache keyed by a hash of its text,
+    so after an edit only the functions whose text changed are lexed and parsed again.
+
+    A function is only cached when parsing it on its own stops exactly on its closing brace without errors,
+    since the Parser then makes the same decisions on it as it would in the middle of the file. When a
+    function fails that check, the rest of the file is parsed in one go, so the statements and errors are
+    always the ones `Parser.parse_program` gives for the whole file.
+
+    Attributes
+    ----------
+    cache : dict[bytes, list[Statement]]
+        the statements of each function by the hash of its text, only the functions of the last parse are kept
+    errors : list[str]
+        the errors of the last parse, with lines and columns in the whole file
+    reused : int
+        how many functions the last parse took from the cache
+    parsed : int
+        how many functions the last parse had to parse
+
+    Methods
+    ----------
+    def parse(self, source: str) -> Program:
+        parses `source`, reusing the functions that did not change since the last call
+    """
+    def __init__(self) -> None:
+        self.cache: dict[bytes, list[Statement]] = {}
+        self.errors: list[str] = []
+        self.reused: int = 0
+        self.parsed: int = 0
+
+    def parse(self, source: str) -> Program:
+        program: Program = Program()
+        cache: dict[bytes, list[Statement]] = {}
+        line_index: LineIndex = LineIndex(source)
+
+        self.errors = []
+        self.reused = 0
+        self.parsed = 0
+
+        spans: list[tuple[int, int]] = function_spans(source)
+        for i, (start, end) in enumerate(spans):
+            key: bytes = hashlib.blake2b(source[start:end].encode(), digest_size=16).digest()
+
+            statements: list[Statement] | None = self.cache.get(key)
+            if statements is not None:
+                self.reused += 1
+            else:
+                self.parsed += 1
+
+                p: Parser = Parser(lexer=TokenBuffer.from_span(source, start, end, line_index))
+                statements = p.parse_program().statements
+
+                # The Parser stops one token past the closing brace, on the EOF token, unless it ran off the end
+                if len(p.errors) > 0 or p.cursor != len(p.tokens) - 1:
+                    if i < len(spans) - 1:
+                        # Parsing the rest of the file together gives the same result as parsing all of it
+                        p = Parser(lexer=TokenBuffer.from_span(source, start, len(source), line_index))
+                        statements = p.parse_program().statements
+
+                    program.statements.extend(statements)
+                    self.errors = p.errors
+                    break
+
+            cache[key] = statements
+            program.statements.extend(statements)
+
+        self.cache = cache
+        return program
@@ -0,0 +1,139 @@
+# LazyJIT.py
+# This file implements a LazyJIT that compiles each function of a program the first time it is called
+
+import ctypes
+import os
+import traceback
+from pathlib import Path
+
+from llvmlite import ir
+import llvmlite.binding as llvm
+
+import ParallelCompiler
+from AOT import create_target_machine
+
+# The function the stubs call to have a module compiled, the "." keeps it apart from every turtle script name
+RESOLVE_SYMBOL: str = "trtl.resolve"
+
+# The name of the JIT library the stubs are linked into
+STUBS_LIBRARY: str = "stubs"
+
+class LazyJIT:
+    """
+    A LazyJIT runs the modules `Compiler.compile_functions` builds on LLVM's ORC LLJIT, compiling the module of
+    a function only when the function is first called, so starting a program takes time for the code that runs
+    rather than for all of it.
+
+    Every function that is called from another module gets a stub, in a small library that is linked first.
+    The stub has the function's name, so the calls from the other modules link to it, and jumps through a
+    pointer that starts out at a resolver. The first call runs the resolver, which calls back into Python to
+    optimize and code generate the function's module, link it and point the pointer at the real function,
+    then carries on with the call. Every later call goes straight through the pointer.
+
+    The modules are optimized and compiled one at a time with the `PassPipeline` and object cache of
+    `ParallelCompiler.compile_modules`, in this process.
+
+    Attributes
+    ----------
+    modules : list[ir.Module]
+        the modules of the program
+    compiled : list[str]
+        the names of the modules compiled so far, in the order they were first needed
+
+    Methods
+    ----------
+    def get_function_address(self, name: str) -> int:
+        compiles the module that defines `name` if it has not been, and returns the address of the function
+    """
+    def __init__(self, modules: list[ir.Module], opt_level: int = 2, cache_dir: Path | None = None) -> None:
+        self.modules: list[ir.Module] = modules
+        self.compiled: list[str] = []
+
+        ParallelCompiler.init_worker(opt_level, cache_dir)
+        self.__jit: llvm.LLJIT = llvm.create_lljit_compiler(create_target_machine(opt_level))
+
+        # The library each module was linked into, by the index of the module
+        self.__libraries: dict[int, llvm.ResourceTracker] = {}
+
+        # The module each function is defined in, and the type of each function that is called from another module
+        self.__defined: dict[str, int] = {}
+        self.__called: dict[str, ir.FunctionType] = {}
+
+        triple: str = llvm.get_default_triple()
+        for i, module in enumerate(modules):
+            module.triple = triple
+            for function in module.functions:
+                if function.is_declaration:
+                    self.__called[function.name] = function.function_type
+                else:
+                    self.__defined[function.name] = i
+
+        # The callback has to stay alive as long as the code that calls it
+        self.__resolve = ctypes.CFUNCTYPE(None, ctypes.c_int32)(self.__on_resolve)
+
+        builder: llvm.JITLibraryBuilder = llvm.JITLibraryBuilder().add_ir(self.__build_stubs(triple))
+        builder.import_symbol(RESOLVE_SYMBOL, ctypes.cast(self.__resolve, ctypes.c_void_p).value)
+        for name in self.__called:
+            builder.export_symbol(f"{name}.ptr")
+        self.__stubs: llvm.ResourceTracker = builder.link(self.__jit, STUBS_LIBRARY)
+
+    def __build_stubs(self, triple: str) -> ir.Module:
+        stubs: ir.Module = ir.Module(STUBS_LIBRARY)
+        stubs.triple = triple
+
+        index_type: ir.IntType = ir.IntType(32)
+        resolve: ir.Function = ir.Function(stubs, ir.FunctionType(ir.VoidType(), [index_type]), RESOLVE_SYMBOL)
+
+        for name, fnty in self.__called.items():
+            resolver: ir.Function = ir.Function(stubs, fnty, f"{name}.resolve")
+            ptr: ir.GlobalVariable = ir.GlobalVariable(stubs, fnty.as_pointer(), f"{name}.ptr")
+            ptr.initializer = resolver
+
+            # The resolver has the module compiled, which points `ptr` at the function, then calls it
+            builder: ir.IRBuilder = ir.IRBuilder(resolver.append_basic_block(f"{name}_resolve"))
+            builder.call(resolve, [ir.Constant(index_type, self.__defined[name])])
+            builder.ret(builder.call(builder.load(ptr), resolver.args))
+
+            stub: ir.Function = ir.Function(stubs, fnty, name)
+            builder = ir.IRBuilder(stub.append_basic_block(f"{name}_stub"))
+            builder.ret(builder.call(builder.load(ptr), stub.args, tail=True))
+
+        return stubs
+
+    def __on_resolve(self, index: int) -> None:
+        try:
+            self.__load(index)
+        except Exception:
+            # The program cannot be told the call failed, and going on would only call the resolver again forever
+            traceback.print_exc()
+            os._exit(1)
+
+    def __load(self, index: int) -> llvm.ResourceTracker:
+        library: llvm.ResourceTracker | None = self.__libraries.get(index)
+        if library is not None:
+            return library
+
+        module: ir.Module = self.modules[index]
+        names: list[str] = [f.name for f in module.functions if not f.is_declaration]
+        data: bytes = ParallelCompiler.compile_modules([str(module)], "obj")[0]
+
+        # The module's calls to functions in other modules link to their stubs
+        builder: llvm.JITLibraryBuilder = llvm.JITLibraryBuilder().add_object_img(data).add_jit_library(STUBS_LIBRARY)
+        for name in names:
+            builder.export_symbol(name)
+        library = builder.link(self.__jit, f"module{index}")
+
+        self.__libraries[index] = library
+        self.compiled.append(module.name)
+
+        for name in names:
+            if name in self.__called:
+                ctypes.c_void_p.from_address(self.__stubs[f"{name}.ptr"]).value = library[name]
+
+        return library
+
+    def get_function_address(self, name: str) -> int:
+        index: int | None = self.__defined.get(name)
+        if index is None:
+            raise KeyError(f"No function named {name}")
+        return self.__load(index)[name]
@@ -1,12 +1,311 @@
 # Lexer.py
 # This file creates a Lexer class to read the source code and prodce tokens
 
-from typing import Any
+import codecs
+import mmap
+import os
+import re
+from typing import IO, Any, Iterator
 from Token import Token, TokenType, lookup_ident
+from LineIndex import LineIndex
+
+# Symbols that are always a single character
+SYMBOLS: dict[str, TokenType] = {
+    '+': TokenType.PLUS,
+    '-': TokenType.MINUS,
+    '*': TokenType.ASTERISK,
+    '/': TokenType.SLASH,
+    '^': TokenType.POW,
+    '%': TokenType.MODULUS,
+    '<': TokenType.LT,
+    '>': TokenType.GT,
+    '=': TokenType.EQ,
+    ':': TokenType.COLON,
+    ',': TokenType.COMMA,
+    '(': TokenType.LPAREN,
+    ')': TokenType.RPAREN,
+    '{': TokenType.LBRACE,
+    '}': TokenType.RBRACE,
+    ';': TokenType.SEMICOLON,
+}
+
+# Symbols made of two characters, these are matched before `SYMBOLS`
+DOUBLE_SYMBOLS: dict[str, TokenType] = {
+    '->': TokenType.ARROW,
+    '<=': TokenType.LT_EQ,
+    '>=': TokenType.GT_EQ,
+    '==': TokenType.EQ_EQ,
+    '!=': TokenType.NOT_EQ,
+}
+
+# The master pattern skips a run of whitespace and then matches one whole token.
+# Only ASCII is handled here, anything else falls through to `other` and is handled in Python
+TOKEN_PATTERN: re.Pattern = re.compile(r"""
+    [ \t\r\n]*
+    (?:
+        (?P<ident>[A-Za-z_]+)
+      | (?P<symbol>[-+*/^%<>=:,(){};](?![=>]))
+      | (?P<number>[0-9][0-9.]*)
+      | (?P<double>->|[<>=!]=)
+      | (?P<other>.)
+    )?
+""", re.VERBOSE | re.DOTALL)
+
+# Number of characters read from a file at a time
+CHUNK_SIZE: int = 64 * 1024
 
 class Lexer:
     """
-    A Lexer reads text and produces tokens
+    A Lexer reads text and produces tokens.
+    Tokens are produced by a generator that runs the precompiled `TOKEN_PATTERN` over the source,
+    each match skips the whitespace and scans a whole identifier, number or symbol in a single step.
+
+    The source is read in chunks of `chunk_size` characters, so files are lexed without ever
+    holding more than a chunk (plus the token crossing its end) in memory.
+
+    Attributes
+    ----------
+    source : str | os.PathLike | IO | mmap.mmap | bytes
+        the source code as a string, a path to a file, an open file object (text or binary), an mmap or bytes.
+        A plain `str` is always treated as source code, wrap file names in a `pathlib.Path`
+    chunk_size : int
+        the number of characters (or bytes) read from the source at a time
+    line_index : LineIndex
+        the start of every line in the source, lines are never counted while lexing
+
+    Methods
+    ----------
+    def next_token(self) -> Token:
+        returns the next token from `tokens()`
+
+    def tokens(self) -> Iterator[Token]:
+        generates every token in `source` as a Token, followed by EOF tokens forever
+
+    def spans(self) -> Iterator[tuple[TokenType, int, int]]:
+        generates the type, start offset and end offset of every token in `source`, ending with one EOF
+
+    def lexeme(self, start: int, end: int) -> str:
+        returns the text between `start` and `end` for the token that was just generated by `spans()`
+
+    def __chunks(self) -> Iterator[str]:
+        generates the source text one chunk at a time
+
+    def __number_end(self, text: str, start: int, end: int, base: int) -> tuple[TokenType, int]:
+        works out if the digits and decimals between `start` and `end` are an INT, FLOAT or ILLEGAL token
+    """
+    def __init__(self, source: str | os.PathLike | IO | mmap.mmap | bytes, chunk_size: int = CHUNK_SIZE) -> None:
+        self.source = source
+        self.chunk_size = chunk_size
+
+        # A str source is indexed lazily, streamed sources are indexed chunk by chunk in `__chunks`
+        self.line_index: LineIndex = LineIndex(source if isinstance(source, str) else "")
+
+        # The chunk of source that `spans()` is currently reading and its offset in the source
+        self.__text: str = ""
+        self.__base: int = 0
+
+        self.__tokens: Iterator[Token] = self.tokens()
+
+    def next_token(self) -> Token:
+        """
+        Reads the next token
+        """
+        return next(self.__tokens)
+
+    def lexeme(self, start: int, end: int) -> str:
+        """
+        Slices the text of a token out of the chunk that is currently in memory
+        """
+        return self.__text[start - self.__base:end - self.__base]
+
+    def tokens(self) -> Iterator[Token]:
+        """
+        Generates the tokens of `source`. After the last token an EOF token is produced on every following read
+        """
+        lines: LineIndex = self.line_index
+
+        for tt, start, end in self.spans():
+            literal: str = self.__text[start - self.__base:end - self.__base]
+
+            if tt == TokenType.INT:
+                yield Token(tt, int(literal), None, start, lines)
+            elif tt == TokenType.FLOAT:
+                yield Token(tt, float(literal), None, start, lines)
+            elif tt == TokenType.EOF:
+                break
+            else:
+                yield Token(tt, literal, None, start, lines)
+
+        while True:
+            yield Token(TokenType.EOF, "", None, start, lines)
+
+    def spans(self) -> Iterator[tuple[TokenType, int, int]]:
+        """
+        Generates the TokenType, start and end offsets of each token in `source`,
+        without building a Token or its literal. The last span is a single EOF
+        """
+        chunks: Iterator[str] = self.__chunks()
+        more: bool = True
+
+        # `text` is the part of the source currently in memory, it starts at offset `base`
+        text: str = ""
+        base: int = 0
+        position: int = 0
+
+        while True:
+            if more:
+                chunk: str | None = next(chunks, None)
+                if chunk is None:
+                    more = False
+                elif position == len(text):
+                    base += position
+                    text, position = chunk, 0
+                else:
+                    base += position
+                    text, position = text[position:] + chunk, 0
+
+                self.__text, self.__base = text, base
+
+            # The scan restarts after refilling `text` or after a token `TOKEN_PATTERN` could not read on its own
+            restart: int | None = None
+
+            for match in TOKEN_PATTERN.finditer(text, position):
+                kind: str | None = match.lastgroup
+                if kind is None:
+                    # Only whitespace was left, which ends the source unless there are more chunks
+                    position = match.end()
+                    if more:
+                        restart = position
+                    break
+
+                start: int = match.start(kind)
+                end: int = match.end()
+                position = start
+
+                if end == len(text) and more:
+                    # The token might carry on into the next chunk
+                    restart = start
+                    break
+
+                match kind:
+                    case 'ident':
+                        if end < len(text) and text[end] >= '\x80':
+                            end = restart = self.__extend(text, end, number=False)
+                            if end == len(text) and more:
+                                restart = start
+                                break
+
+                        yield lookup_ident(text[start:end]), base + start, base + end
+                    case 'symbol':
+                        yield SYMBOLS[text[start]], base + start, base + end
+                    case 'number':
+                        if end < len(text) and text[end] >= '\x80':
+                            end = self.__extend(text, end, number=True)
+                            if end == len(text) and more:
+                                restart = start
+                                break
+
+                        tt, end = self.__number_end(text, start, end, base)
+                        yield tt, base + start, base + end
+
+                        # Most numbers end where the match did and need no restart
+                        if end != match.end():
+                            restart = end
+                    case 'double':
+                        yield DOUBLE_SYMBOLS[text[start:end]], base + start, base + end
+                    case _:
+                        ch: str = text[start]
+                        if ch >= '\x80' and (ch.isalpha() or ch.isdigit()):
+                            # Non ascii letters and digits follow the same rules as the ascii ones
+                            end = restart = self.__extend(text, end, number=ch.isdigit())
+                            if end == len(text) and more:
+                                restart = start
+                                break
+
+                            if ch.isalpha():
+                                yield lookup_ident(text[start:end]), base + start, base + end
+                            else:
+                                tt, restart = self.__number_end(text, start, end, base)
+                                yield tt, base + start, base + restart
+                        else:
+                            yield SYMBOLS.get(ch, TokenType.ILLEGAL), base + start, base + end
+
+                position = end
+                if restart is not None:
+                    position = restart
+                    break
+            
+            if restart is None and not more:
+                break
+
+        yield TokenType.EOF, base + position, base + position
+
+    def __chunks(self) -> Iterator[str]:
+        """
+        Generates the source text in chunks of at most `chunk_size`
+        """
+        if isinstance(self.source, str):
+            yield self.source
+            return
+
+        for chunk in self.__read_chunks():
+            self.line_index.add(chunk)
+            yield chunk
+
+    def __read_chunks(self) -> Iterator[str]:
+        source = self.source
+        size: int = self.chunk_size
+
+        if isinstance(source, os.PathLike):
+            with open(source, "r") as f:
+                while chunk := f.read(size):
+                    yield chunk
+            return
+
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        if isinstance(source, (mmap.mmap, bytes, bytearray)):
+            for offset in range(0, len(source), size):
+                yield decoder.decode(source[offset:offset + size])
+        else:
+            while chunk := source.read(size):
+                yield chunk if isinstance(chunk, str) else decoder.decode(chunk)
+
+        yield decoder.decode(b"", final=True)
+
+    def __extend(self, text: str, end: int, number: bool) -> int:
+        """
+        Continues an identifier or a number past non ascii letters or digits and returns the new end
+        """
+        if number:
+            while end < len(text) and (text[end].isdigit() or text[end] == '.'):
+                end += 1
+        else:
+            while end < len(text) and (text[end].isalpha() or text[end] == '_'):
+                end += 1
+
+        return end
+
+    def __number_end(self, text: str, start: int, end: int, base: int) -> tuple[TokenType, int]:
+        """
+        Checks the decimals of the number between `start` and `end` and returns its TokenType along with where it ends
+        """
+        first_dot: int = text.find('.', start, end)
+        if first_dot == -1:
+            return TokenType.INT, end
+
+        second_dot: int = text.find('.', first_dot + 1, end)
+        if second_dot != -1:
+            # Stop on the second decimal, it gets read as its own ILLEGAL token next
+            print(f"Too many decimals on line {self.line_index.line(base + second_dot)}, position {base + second_dot}")
+            return TokenType.ILLEGAL, second_dot
+
+        return TokenType.FLOAT, end
+
+# region Legacy Lexer
+class LegacyLexer:
+    """
+    The original character-at-a-time Lexer. It is no longer used by the Parser but is kept
+    as the reference implementation that `Benchmark.py` checks the `Lexer` against
 
     Attributes
     ----------
@@ -203,4 +502,5 @@ class Lexer:
                     tok = self.__new_token(TokenType.ILLEGAL, self.current_char)
         
         self.__read_char()
-        return tok
\ No newline at end of file
+        return tok
+# endregion
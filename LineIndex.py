@@ -0,0 +1,81 @@
+# LineIndex.py
+# This file defines the LineIndex class, which turns offsets in the source into lines and columns
+
+from array import array
+from bisect import bisect_right
+
+class LineIndex:
+    """
+    A LineIndex stores the offset where every line of the source starts, so that any offset can be
+    turned into a (line, column) pair with a binary search. Lines and columns count from 0.
+
+    The text given to the constructor is scanned with one bulk `str.find` pass, and only the first time a
+    location is asked for, so lexing and parsing a correct program never pays for it. Text that is
+    streamed in with `add` is scanned straight away, since it is not kept in memory.
+
+    A LineIndex for a piece cut out of a bigger file can be given the `line` and `column` the piece starts at,
+    so that its locations are the ones in the whole file.
+
+    Attributes
+    ----------
+    starts : array('I')
+        the offset of the first character of each line
+    first_line : int
+        the line the text starts on
+    first_column : int
+        the column the text starts on, which only applies to its first line
+
+    Methods
+    ----------
+    def add(self, text: str) -> None:
+        adds the lines of `text`, which follows on from the text that was already added
+
+    def location(self, offset: int) -> tuple[int, int]:
+        returns the line and column of `offset`
+
+    def line(self, offset: int) -> int:
+        returns the line of `offset`
+    """
+    def __init__(self, text: str = "", line: int = 0, column: int = 0) -> None:
+        self.starts: array = array('I', [0])
+        self.first_line: int = line
+        self.first_column: int = column
+
+        self.__length: int = 0
+        self.__pending: str | None = text or None
+
+    def add(self, text: str) -> None:
+        """
+        Scans `text` for new lines, `text` carries on from the end of the text added before it
+        """
+        if self.__pending is not None:
+            self.__build()
+
+        starts: array = self.starts
+        base: int = self.__length
+
+        newline: int = text.find('\n')
+        while newline != -1:
+            starts.append(base + newline + 1)
+            newline = text.find('\n', newline + 1)
+
+        self.__length += len(text)
+
+    def __build(self) -> None:
+        text: str = self.__pending
+        self.__pending = None
+        self.add(text)
+
+    def location(self, offset: int) -> tuple[int, int]:
+        if self.__pending is not None:
+            self.__build()
+
+        line: int = bisect_right(self.starts, offset) - 1
+        column: int = offset - self.starts[line]
+        if line == 0:
+            column += self.first_column
+
+        return line + self.first_line, column
+
+    def line(self, offset: int) -> int:
+        return self.location(offset)[0]
@@ -0,0 +1,88 @@
+# ObjectCache.py
+# This file implements an ObjectCache that stores the machine code MCJIT builds on disk, so unchanged modules skip LLVM
+
+import hashlib
+from pathlib import Path
+
+import llvmlite.binding as llvm
+
+from ASTCache import CACHE_DIR, CHECKSUM_SIZE, write_atomic
+from Compiler import COMPILER_VERSION
+
+class ObjectCache:
+    """
+    An ObjectCache stores the object code of each module in a file named after a hash of its IR, the target triple,
+    the optimization level, the relocation model, CPU and features of the target machine and the versions of the
+    compiler and LLVM, so the JIT and the position independent builds never share an object. It is hooked into an execution engine with
+    llvmlite's object cache callbacks: on a miss the engine hands over the object it built, and on a hit the engine
+    loads the cached object instead of running code generation.
+
+    Each file starts with a hash of the object code after it. LLVM kills the process when it is handed something
+    that is not an object, so a file cut short or written by something else is deleted and treated as a miss.
+
+    On a hit the module does not have to be parsed, verified or optimized at all, since the engine only needs a
+    module to ask the cache about, so an empty one from `empty_module` can be given to it instead.
+
+    Attributes
+    ----------
+    directory : Path
+        the directory the cache files are kept in
+
+    Methods
+    ----------
+    def key(self, ir_text: str, triple: str, opt_level: int, reloc: str = "default", cpu: str = "", features: str = "") -> str:
+        returns the cache key of the module `ir_text` compiled for `triple` at `opt_level`, by a target machine
+        created with `reloc`, `cpu` and `features`
+
+    def load(self, key: str) -> bytes | None:
+        returns the cached object code, or None when there is none
+
+    def store(self, key: str, data: bytes) -> None:
+        writes the object code `data` to the cache
+
+    def attach(self, engine: llvm.ExecutionEngine, key: str, data: bytes | None = None) -> None:
+        makes `engine` load its object code from the cache under `key`, or use `data` when it was loaded already,
+        and store it there when it is missing
+
+    def empty_module(self, triple: str) -> llvm.ModuleRef:
+        returns a module with nothing in it, to build an engine around when the object code is cached
+    """
+    def __init__(self, directory: Path = CACHE_DIR) -> None:
+        self.directory = Path(directory)
+
+    def key(self, ir_text: str, triple: str, opt_level: int, reloc: str = "default", cpu: str = "", features: str = "") -> str:
+        llvm_version: str = ".".join(map(str, llvm.llvm_version_info))
+        target: str = "\0".join((COMPILER_VERSION, llvm_version, triple, str(opt_level), reloc, cpu, features))
+        digest = hashlib.blake2b(f"{target}\0".encode(), digest_size=20)
+        digest.update(ir_text.encode())
+        return digest.hexdigest()
+
+    def __path(self, key: str) -> Path:
+        return self.directory / f"{key}.o"
+
+    def load(self, key: str) -> bytes | None:
+        try:
+            data: bytes = self.__path(key).read_bytes()
+        except OSError:
+            return None
+
+        checksum, data = data[:CHECKSUM_SIZE], data[CHECKSUM_SIZE:]
+        if len(data) == 0 or hashlib.blake2b(data, digest_size=CHECKSUM_SIZE).digest() != checksum:
+            self.__path(key).unlink(missing_ok=True)
+            return None
+        return data
+
+    def store(self, key: str, data: bytes) -> None:
+        write_atomic(self.__path(key), hashlib.blake2b(data, digest_size=CHECKSUM_SIZE).digest() + data)
+
+    def attach(self, engine: llvm.ExecutionEngine, key: str, data: bytes | None = None) -> None:
+        # The engine asks about every module it finalizes, so it must only be given the one module `key` is for
+        engine.set_object_cache(
+            notify_func=lambda module, buffer: self.store(key, buffer),
+            getbuffer_func=lambda module: data if data is not None else self.load(key),
+        )
+
+    def empty_module(self, triple: str) -> llvm.ModuleRef:
+        module: llvm.ModuleRef = llvm.parse_assembly("")
+        module.triple = triple
+        return module
@@ -0,0 +1,348 @@
+# Optimizer.py
+# This file implements the passes that simplify the AST between the Parser and the Compiler
+
+import math
+import struct
+
+from AST import NodeVisitor, NodeTransformer, Node, Program, Statement, Expression
+from AST import ExpressionStatement, LetStatement, BlockStatement, FunctionStatement, ReturnStatement, IfStatement
+from AST import InfixExpression, CallExpression
+from AST import IntegerLiteral, FloatLiteral, IdentifierLiteral, BooleanLiteral
+from AST import FunctionParameter
+
+# The range of the 32 bit signed integers `int` compiles to
+INT_MIN: int = -2 ** 31
+INT_MAX: int = 2 ** 31 - 1
+
+# The most nodes the returned expression of a function can have for the Inliner to copy it into its callers
+INLINE_BUDGET: int = 16
+
+def wrap_int(value: int) -> int:
+    """
+    Wraps `value` around into the range of an `int`, like LLVM's `add`, `sub` and `mul` do
+    """
+    return (value - INT_MIN) % 2 ** 32 + INT_MIN
+
+def round_float(value: float) -> float:
+    """
+    Rounds `value` to the nearest 32 bit float, since `float` compiles to LLVM's `float`
+    """
+    return struct.unpack("f", struct.pack("f", value))[0]
+
+def fold_int(operator: str, left: int, right: int) -> int | bool | None:
+    """
+    Returns what the Compiler's code for `left operator right` gives on two `int`s,
+    or None when it cannot be worked out ahead of time
+    """
+    if not (INT_MIN <= left <= INT_MAX and INT_MIN <= right <= INT_MAX):
+        return None
+
+    match operator:
+        case '+':
+            return wrap_int(left + right)
+        case '-':
+            return wrap_int(left - right)
+        case '*':
+            return wrap_int(left * right)
+        case '/' | '%':
+            # Both are undefined behaviour in LLVM, so they are left for the program to hit at runtime
+            if right == 0 or (left == INT_MIN and right == -1):
+                return None
+
+            # `sdiv` rounds towards zero and `srem` takes the sign of `left`, unlike Python's `//` and `%`
+            quotient: int = abs(left) // abs(right)
+            if (left < 0) != (right < 0):
+                quotient = -quotient
+            return quotient if operator == '/' else left - right * quotient
+        case '<':
+            return left < right
+        case '<=':
+            return left <= right
+        case '>':
+            return left > right
+        case '>=':
+            return left >= right
+        case '==':
+            return left == right
+        case '!=':
+            return left != right
+
+    return None
+
+def fold_float(operator: str, left: float, right: float) -> float | bool | None:
+    """
+    Returns what the Compiler's code for `left operator right` gives on two `float`s,
+    or None when it cannot be worked out ahead of time
+    """
+    try:
+        left, right = round_float(left), round_float(right)
+    except OverflowError:
+        return None
+
+    # Working in 64 bit floats and rounding once gives the same result as the 32 bit instruction for these
+    match operator:
+        case '+':
+            value: float = left + right
+        case '-':
+            value = left - right
+        case '*':
+            value = left * right
+        case '/':
+            if right == 0:
+                return None
+            value = left / right
+        case '%':
+            if right == 0:
+                return None
+            value = math.fmod(left, right)
+        case '<':
+            return left < right
+        case '<=':
+            return left <= right
+        case '>':
+            return left > right
+        case '>=':
+            return left >= right
+        case '==':
+            return left == right
+        case '!=':
+            return left != right
+        case _:
+            return None
+
+    try:
+        value = round_float(value)
+    except OverflowError:
+        return None
+
+    # Leave infinities and NaNs to the runtime rather than writing them into the AST
+    return value if math.isfinite(value) else None
+
+class ConstantFolder(NodeTransformer):
+    """
+    A ConstantFolder works out the infix expressions whose sides are both literals, drops the `if` branches
+    that can never run and the statements after a `return`, so less IR is built and handed to LLVM.
+
+    It gives back a new tree and leaves the one it was given as it was.
+
+    Attributes
+    ----------
+    folded : int
+        the number of infix expressions replaced by a literal
+    removed : int
+        the number of statements removed, counting an `if` whose branch was kept in its place as one
+
+    Methods
+    ----------
+    def fold(self, program: Program) -> Program:
+        returns the simplified `program`
+    """
+    def __init__(self) -> None:
+        self.folded: int = 0
+        self.removed: int = 0
+
+    def fold(self, program: Program) -> Program:
+        return self.visit(program)
+
+    def visit_infix_expression(self, node: InfixExpression) -> Expression:
+        node = self.generic_visit(node)
+        left, right = node.left_node, node.right_node
+
+        if isinstance(left, IntegerLiteral) and isinstance(right, IntegerLiteral):
+            value: int | float | bool | None = fold_int(node.operator, left.value, right.value)
+        elif isinstance(left, FloatLiteral) and isinstance(right, FloatLiteral):
+            value = fold_float(node.operator, left.value, right.value)
+        else:
+            return node
+
+        if value is None:
+            return node
+
+        self.folded += 1
+        if isinstance(value, bool):
+            return BooleanLiteral(value)
+        elif isinstance(value, int):
+            return IntegerLiteral(value)
+        return FloatLiteral(value)
+
+    def visit_expression_statement(self, node: ExpressionStatement) -> Node | list[Statement] | None:
+        if not isinstance(node.expr, IfStatement):
+            return self.generic_visit(node)
+
+        # The Parser wraps every `if` in an ExpressionStatement, so the statement is what gets replaced
+        expr: Node | list[Statement] | None = self.visit(node.expr)
+        if expr is None or isinstance(expr, list):
+            return expr
+        return node if expr is node.expr else ExpressionStatement(expr)
+
+    def visit_if_statement(self, node: IfStatement) -> Node | list[Statement] | None:
+        node = self.generic_visit(node)
+        if not isinstance(node.condition, BooleanLiteral):
+            return node
+
+        # Blocks do not open a new scope, so the statements of the branch that runs can take the place of the `if`
+        self.removed += 1
+        branch: BlockStatement | None = node.consequence if node.condition.value else node.alternative
+        if branch is None:
+            return None
+        return branch.statements
+
+    def visit_block_statement(self, node: BlockStatement) -> BlockStatement:
+        node = self.generic_visit(node)
+
+        for i, stmt in enumerate(node.statements):
+            if isinstance(stmt, ReturnStatement) and i < len(node.statements) - 1:
+                self.removed += len(node.statements) - i - 1
+                return BlockStatement(node.statements[:i + 1])
+
+        return node
+
+class SymbolUses(NodeVisitor):
+    """
+    Counts the nodes in a tree and how many times each symbol is used in it
+
+    Attributes
+    ----------
+    size : int
+        the number of nodes visited
+    uses : dict[int, int]
+        the number of identifiers with each `SYMBOL_TABLE` id
+    """
+    def __init__(self) -> None:
+        self.size: int = 0
+        self.uses: dict[int, int] = {}
+
+    def visit(self, node: Node) -> None:
+        self.size += 1
+        super().visit(node)
+
+    def visit_identifier_literal(self, node: IdentifierLiteral) -> None:
+        self.uses[node.symbol] = self.uses.get(node.symbol, 0) + 1
+
+class LocalNames(NodeVisitor):
+    """
+    Collects the symbols a function declares, its parameters and the names of its `let` statements
+
+    Attributes
+    ----------
+    symbols : set[int]
+        the `SYMBOL_TABLE` ids of the names declared
+    """
+    def __init__(self) -> None:
+        self.symbols: set[int] = set()
+
+    def visit_function_parameter(self, node: FunctionParameter) -> None:
+        self.symbols.add(node.symbol)
+
+    def visit_let_statement(self, node: LetStatement) -> None:
+        self.symbols.add(node.name.symbol)
+        self.generic_visit(node)
+
+class Substitution(NodeTransformer):
+    """
+    Replaces the identifiers of the parameters of a function with the arguments of a call to it
+    """
+    def __init__(self, arguments: dict[int, Expression]) -> None:
+        self.arguments: dict[int, Expression] = arguments
+
+    def visit_identifier_literal(self, node: IdentifierLiteral) -> Expression:
+        return self.arguments.get(node.symbol, node)
+
+class Inliner(NodeTransformer):
+    """
+    An Inliner replaces calls to small functions with the expression the function returns, with the arguments
+    put in place of the parameters, so the constants they are called with can be folded before any IR is built.
+
+    A function can be inlined when its body is a single `return` of an expression of at most `budget` nodes
+    that does not call the function itself. The functions are inlined into each other in source order, since a
+    function can only call the ones defined before it, and they are all kept as they are compiled and called
+    from outside too. A call is left alone when:
+    - an argument that is not a literal or an identifier would be copied into more than one place
+    - the caller declares a name the returned expression uses, which would then mean the caller's variable
+
+    It gives back a new tree and leaves the one it was given as it was.
+
+    Attributes
+    ----------
+    budget : int
+        the most nodes the returned expression can have
+    inlined : int
+        the number of calls replaced
+
+    Methods
+    ----------
+    def inline(self, program: Program) -> Program:
+        returns `program` with the calls to the small functions replaced
+    """
+    def __init__(self, budget: int = INLINE_BUDGET) -> None:
+        self.budget: int = budget
+        self.inlined: int = 0
+
+        # The parameters, returned expression and symbol uses of each function that can be inlined
+        self.__functions: dict[int, tuple[list[int], Expression, dict[int, int]]] = {}
+
+        # The symbols declared by the function being visited
+        self.__locals: set[int] = set()
+
+    def inline(self, program: Program) -> Program:
+        return self.visit(program)
+
+    def visit_function_statement(self, node: FunctionStatement) -> FunctionStatement:
+        names: LocalNames = LocalNames()
+        names.visit(node)
+        self.__locals = names.symbols
+
+        node = self.generic_visit(node)
+        symbol: int = node.name.symbol
+
+        # A function defined again with the same name no longer means the earlier one
+        self.__functions.pop(symbol, None)
+
+        statements: list[Statement] = node.body.statements
+        if len(statements) != 1 or not isinstance(statements[0], ReturnStatement):
+            return node
+
+        expr: Expression = statements[0].return_value
+        counter: SymbolUses = SymbolUses()
+        counter.visit(expr)
+        if counter.size <= self.budget and symbol not in counter.uses:
+            self.__functions[symbol] = ([p.symbol for p in node.parameters], expr, counter.uses)
+
+        return node
+
+    def visit_call_expression(self, node: CallExpression) -> Expression:
+        node = self.generic_visit(node)
+
+        # Only a call by name can be to a function that was inlined
+        if not isinstance(node.function, IdentifierLiteral):
+            return node
+
+        symbol: int = node.function.symbol
+        function: tuple[list[int], Expression, dict[int, int]] | None = self.__functions.get(symbol)
+        if function is None or symbol in self.__locals:
+            return node
+
+        parameters, expr, uses = function
+        if len(node.arguments) != len(parameters):
+            return node
+
+        for parameter, argument in zip(parameters, node.arguments):
+            copies: int = uses.get(parameter, 0)
+            if copies > 1 and not isinstance(argument, (IntegerLiteral, FloatLiteral, IdentifierLiteral, BooleanLiteral)):
+                return node
+
+        # The names the expression uses besides the parameters are functions, unless the caller declares them too
+        if any(s in self.__locals for s in uses if s not in parameters):
+            return node
+
+        self.inlined += 1
+        return Substitution(dict(zip(parameters, node.arguments))).visit(expr)
+
+def optimize(program: Program, inline_budget: int = INLINE_BUDGET) -> Program:
+    """
+    Runs the optimization passes over `program` and returns the new tree.
+    Functions are only inlined when `inline_budget` is above 0
+    """
+    if inline_budget > 0:
+        program = Inliner(budget=inline_budget).inline(program)
+    return ConstantFolder().fold(program)
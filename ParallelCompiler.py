@@ -0,0 +1,156 @@
+# ParallelCompiler.py
+# This file implements a ParallelCompiler that optimizes and code generates the modules of a program in worker processes
+
+from pathlib import Path
+
+from llvmlite import ir
+import llvmlite.binding as llvm
+
+from AOT import RELOC_MODEL
+from ObjectCache import ObjectCache
+from PassPipeline import PassPipeline
+from WorkerPool import WorkerPool, split_batches
+
+# The relocation model of the objects MCJIT loads, since it relocates the position independent objects
+# built for the system linker wrongly, like loads of float constants
+JIT_RELOC_MODEL: str = "default"
+
+# The relocation model of the target machine of each worker process, set once by `init_worker`
+RELOC: str = RELOC_MODEL
+
+# The target machine of each worker process, created once by `init_worker`
+TARGET_MACHINE: llvm.TargetMachine | None = None
+
+# The LLVM optimization passes of each worker process, created once by `init_worker`
+PIPELINE: PassPipeline | None = None
+
+# The object code cache of each worker process, or None when objects are not cached
+OBJECT_CACHE: ObjectCache | None = None
+
+def init_worker(opt_level: int = 2, cache_dir: Path | None = None, reloc: str = RELOC_MODEL) -> None:
+    """
+    Initializes LLVM once per worker process, so every module compiled by the worker can skip it.
+    `reloc` is `AOT.RELOC_MODEL` for objects the system toolchain links, or `JIT_RELOC_MODEL` for objects MCJIT loads
+    """
+    global RELOC, TARGET_MACHINE, PIPELINE, OBJECT_CACHE
+
+    llvm.initialize()
+    llvm.initialize_native_target()
+    llvm.initialize_native_asmprinter()
+
+    RELOC = reloc
+    TARGET_MACHINE = llvm.Target.from_default_triple().create_target_machine(opt=opt_level, reloc=reloc)
+    PIPELINE = PassPipeline(opt_level=opt_level)
+    OBJECT_CACHE = ObjectCache(cache_dir) if cache_dir is not None else None
+
+def compile_modules(texts: list[str], emit: str) -> list[bytes]:
+    """
+    Parses, verifies and optimizes the IR of each module in `texts`, in a worker process. `emit` is "obj" to
+    return the object code of each module, taken from the cache when it is there, or "bitcode" to return the
+    optimized module as LLVM bitcode
+    """
+    results: list[bytes] = []
+    for text in texts:
+        if emit == "obj" and OBJECT_CACHE is not None:
+            key: str = OBJECT_CACHE.key(text, TARGET_MACHINE.triple, PIPELINE.opt_level, RELOC)
+            data: bytes | None = OBJECT_CACHE.load(key)
+            if data is not None:
+                results.append(data)
+                continue
+
+        module: llvm.ModuleRef = llvm.parse_assembly(text)
+        module.verify()
+        PIPELINE.run(module, TARGET_MACHINE)
+
+        if emit == "bitcode":
+            results.append(module.as_bitcode())
+            continue
+
+        data = TARGET_MACHINE.emit_object(module)
+        if OBJECT_CACHE is not None:
+            OBJECT_CACHE.store(key, data)
+        results.append(data)
+
+    return results
+
+class ParallelCompiler(WorkerPool):
+    """
+    A ParallelCompiler runs LLVM over the modules `Compiler.compile_functions` builds, one for each top-level
+    function, cutting them into batches of about the same size and handing the batches to a pool of worker
+    processes. The results come back in the order of the modules, either as object code for the system linker,
+    or for MCJIT when `reloc` is `JIT_RELOC_MODEL`, or linked back into a single module with `link_in`. It should
+    be closed (or used in a `with` block) to stop the workers.
+
+    The LLVM inliner only sees one module at a time, so calls between top-level functions are not inlined
+    by it, the Optimizer's Inliner still inlines the small ones before the IR is built.
+
+    Attributes
+    ----------
+    workers : int
+        the number of worker processes, 1 compiles the modules in this process
+    opt_level : int
+        the LLVM optimization level of the `PassPipeline` the modules are run through
+    cache_dir : Path | None
+        the directory the object code of each module is cached in, None to not cache it
+    reloc : str
+        the relocation model the objects are built with, `AOT.RELOC_MODEL` by default
+
+    Methods
+    ----------
+    def compile_objects(self, modules: list[ir.Module]) -> list[bytes]:
+        returns the object code of each module
+
+    def compile_module(self, modules: list[ir.Module]) -> llvm.ModuleRef:
+        returns the optimized modules linked into one
+
+    def add_objects(self, engine: llvm.ExecutionEngine, objects: list[bytes]) -> None:
+        loads `objects`, built with `JIT_RELOC_MODEL`, into `engine`, which resolves the calls between them
+        when it is finalized
+
+    def close(self) -> None:
+        stops the worker processes
+    """
+    def __init__(self, workers: int | None = None, opt_level: int = 2, cache_dir: Path | None = None,
+                 reloc: str = RELOC_MODEL) -> None:
+        super().__init__(workers, initializer=init_worker, initargs=(opt_level, cache_dir, reloc))
+        self.opt_level: int = opt_level
+        self.cache_dir: Path | None = cache_dir
+        self.reloc: str = reloc
+
+    def compile_objects(self, modules: list[ir.Module]) -> list[bytes]:
+        return self.__run(modules, "obj")
+
+    def compile_module(self, modules: list[ir.Module]) -> llvm.ModuleRef:
+        linked: llvm.ModuleRef | None = None
+        for data in self.__run(modules, "bitcode"):
+            module: llvm.ModuleRef = llvm.parse_bitcode(data)
+            if linked is None:
+                linked = module
+            else:
+                # The declarations in each module are resolved to the definitions in the others as they are linked
+                linked.link_in(module)
+        return linked
+
+    def add_objects(self, engine: llvm.ExecutionEngine, objects: list[bytes]) -> None:
+        for data in objects:
+            engine.add_object_file(llvm.ObjectFileRef.from_data(data))
+
+    def __run(self, modules: list[ir.Module], emit: str) -> list[bytes]:
+        triple: str = llvm.get_default_triple()
+        texts: list[str] = []
+        for module in modules:
+            module.triple = triple
+            texts.append(str(module))
+
+        if self.workers == 1 or len(texts) < 2:
+            # Sending the modules to the workers would cost more than it saves
+            init_worker(self.opt_level, self.cache_dir, self.reloc)
+            return compile_modules(texts, emit)
+
+        # Cut the modules into batches with about the same amount of IR, keeping them in order
+        batches: list[list[str]] = split_batches(texts, list(map(len, texts)), self.workers)
+
+        results: list[bytes] = []
+        for batch_results in self.pool().map(compile_modules, batches, [emit] * len(batches)):
+            results.extend(batch_results)
+        return results
@@ -0,0 +1,128 @@
+# ParallelParser.py
+# This file implements a ParallelParser that parses the top-level functions of a file in a pool of worker processes
+
+import gc
+
+from Lexer import Lexer
+from LineIndex import LineIndex
+from Parser import Parser
+from TokenBuffer import TokenBuffer
+from IncrementalParser import function_spans
+from AST import Statement, Program
+from WorkerPool import WorkerPool, split_batches
+
+# Files smaller than this are parsed in the calling process, since sending them to the workers costs more than it saves
+MIN_PARALLEL_SIZE: int = 256 * 1024
+
+def parse_spans(spans: list[tuple[str, int, int]]) -> list[tuple[list[Statement], list[str]] | None]:
+    """
+    Parses each `(text, line, column)` span on its own, in a worker process. The errors use the `line` and `column`
+    the span starts at in the whole file. A span comes back as None when the Parser did not stop exactly on its
+    closing brace, as it could then have read on into the next function when parsing the whole file
+    """
+    results: list[tuple[list[Statement], list[str]] | None] = []
+
+    # The AST has no reference cycles, so the collector would only waste time walking the new nodes
+    gc_enabled: bool = gc.isenabled()
+    gc.disable()
+    try:
+        for text, line, column in spans:
+            tokens: TokenBuffer = TokenBuffer.from_lexer(Lexer(text))
+            tokens.line_index = LineIndex(text, line, column)
+
+            p: Parser = Parser(lexer=tokens)
+            statements: list[Statement] = p.parse_program().statements
+
+            if p.cursor == len(p.tokens) - 1:
+                results.append((statements, p.errors))
+            else:
+                results.append(None)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    return results
+
+class ParallelParser(WorkerPool):
+    """
+    A ParallelParser splits a file into its top-level functions, parses them in a pool of worker processes
+    and puts `Program.statements` back together in source order. It gives the same statements and errors
+    as `Parser.parse_program`, and should be closed (or used in a `with` block) to stop the workers.
+
+    Attributes
+    ----------
+    workers : int
+        the number of worker processes
+    errors : list[str]
+        the errors of the last parse, with lines and columns in the whole file
+
+    Methods
+    ----------
+    def parse(self, source: str) -> Program:
+        parses `source`, splitting the work over the workers when it is big enough
+
+    def close(self) -> None:
+        stops the worker processes
+    """
+    def __init__(self, workers: int | None = None) -> None:
+        super().__init__(workers)
+        self.errors: list[str] = []
+
+    def parse(self, source: str) -> Program:
+        spans: list[tuple[int, int]] = function_spans(source)
+        if len(source) < MIN_PARALLEL_SIZE or len(spans) < 2:
+            return self.__parse_rest(source, 0, Program())
+
+        # Find the line and column each span starts at, and cut the spans into batches of about the same size
+        located: list[tuple[str, int, int]] = []
+        line: int = 0
+        previous: int = 0
+        for start, end in spans:
+            line += source.count('\n', previous, start)
+            previous = start
+            column: int = start - (source.rfind('\n', 0, start) + 1)
+            located.append((source[start:end], line, column))
+
+        batches: list[list[tuple[str, int, int]]] = split_batches(located, [end - start for start, end in spans], self.workers)
+
+        program: Program = Program()
+        self.errors = []
+
+        # Unpickling the nodes is slower than parsing them when the collector keeps walking them
+        gc_enabled: bool = gc.isenabled()
+        gc.disable()
+        try:
+            results = self.pool().map(parse_spans, batches)
+            first: int = 0
+            for batch in batches:
+                try:
+                    batch_results = next(results)
+                except RecursionError:
+                    # Very deeply nested expressions cannot be pickled to send them back from the worker
+                    return self.__parse_rest(source, spans[first][0], program)
+
+                for (start, _), result in zip(spans[first:first + len(batch)], batch_results):
+                    if result is None:
+                        # Parsing the rest of the file together gives the same result as parsing all of it
+                        return self.__parse_rest(source, start, program)
+
+                    statements, errors = result
+                    program.statements.extend(statements)
+                    self.errors.extend(errors)
+
+                first += len(batch)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        return program
+
+    def __parse_rest(self, source: str, start: int, program: Program) -> Program:
+        if start == 0:
+            self.errors = []
+
+        p: Parser = Parser(lexer=TokenBuffer.from_span(source, start, len(source)))
+        program.statements.extend(p.parse_program().statements)
+        self.errors.extend(p.errors)
+
+        return program
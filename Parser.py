@@ -1,8 +1,9 @@
 # Parser.py
 # This file implements a Parer class that uses the Lexer to build an AST of Tokens
 from Lexer import Lexer
-from Token import Token, TokenType
-from typing import Callable
+from Token import Token, TokenType, TOKEN_TYPES
+from TokenBuffer import TokenBuffer
+from typing import Any, Callable
 from enum import Enum, auto
 
 from AST import Statement, Expression, Program
@@ -23,6 +24,12 @@ class PrecedenceType(Enum):
     P_CALL = auto()
     # P_INDEX = auto()
 
+# The unfinished expressions kept on the stack of `Parser.__parse_expression`
+class FrameType(Enum):
+    INFIX = auto()
+    GROUP = auto()
+    CALL = auto()
+
 # Precedence Mapping
 PRECEDENCES: dict[TokenType, PrecedenceType] = {
     TokenType.PLUS: PrecedenceType.P_SUM,
@@ -41,31 +48,40 @@ PRECEDENCES: dict[TokenType, PrecedenceType] = {
     TokenType.LPAREN: PrecedenceType.P_CALL
 }
 
+# The precedences as plain integers, for comparing them in `Parser.__parse_expression`
+PRECEDENCE_VALUES: dict[TokenType, int] = {tt: prec.value for tt, prec in PRECEDENCES.items()}
+
 class Parser:
     """
     A Parser uses the lexer to construct an Abstract Syntax Tree of Tokens
 
     Attributes
     ----------
-    lexer : Lexer
-        an instance of the Lexer class
+    tokens : TokenBuffer
+        the tokens to parse, read straight from the Lexer when the Parser is given one
     errors : list[str]
         a running list of errors
-    current_token: Token
-        the current token
-    peek_token: int
-        the next token
+    cursor : int
+        the index of the current token in `tokens`
+    current_type: TokenType
+        the type of the current token
+    peek_type: TokenType
+        the type of the next token
     prefix_parse_fns: dict[TokenType, Callable]
         holds a dictionary that maps the TokenType to a function
-          to be called when parsing a prefix expression
-    infix_parse_fns: dict[TokenType, Callable]
-        holds a dictionary that maps the TokenType to a function
-          to be called when parsing an infix expression
+          to be called when parsing a prefix expression,
+          groups, infix and call expressions are parsed by `__parse_expression` itself
 
     Methods
     ----------
+    def current_token(self) -> Token:
+        builds the current token as a Token, for debugging
+
+    def peek_token(self) -> Token:
+        builds the next token as a Token, for debugging
+
     def __next_token(self) -> None:
-        gets the next token and assigns curent and peek token variables accordingly
+        moves the cursor to the next token and updates the current and peek types accordingly
     
     def __current_token_is(self, tt: TokenType):
         returns bool of if current token is of tt type
@@ -74,54 +90,56 @@ class Parser:
         returns bool of if peek token is of tt type
     """
     DEBUG = True
-    def __init__(self, lexer: Lexer) -> None:
-        self.lexer = lexer
+    def __init__(self, lexer: Lexer | TokenBuffer) -> None:
+        self.tokens: TokenBuffer = lexer if isinstance(lexer, TokenBuffer) else TokenBuffer.from_lexer(lexer)
 
         self.errors: list[str] = []
         
-        self.current_token : Token = None
-        self.peek_token : Token = None
+        self.cursor: int = -2
+        self.current_type: TokenType = None
+        self.peek_type: TokenType = None
 
         self.prefix_parse_fns: dict[TokenType, Callable] = {
             TokenType.IDENT : self.__parse_identifier,
             TokenType.INT : self.__parse_int_literal,
             TokenType.FLOAT: self.__parse_float_literal,
-            TokenType.LPAREN: self.__parse_grouped_expression,
             TokenType.IF: self.__parse_if_statement,
             TokenType.TRUE: self.__parse_boolean,
             TokenType.FALSE: self.__parse_boolean
         }
 
-        self.infix_parse_fns: dict[TokenType, Callable] = {
-            TokenType.PLUS : self.__parse_infix_expression,
-            TokenType.MINUS : self.__parse_infix_expression,
-            TokenType.SLASH : self.__parse_infix_expression,
-            TokenType.ASTERISK : self.__parse_infix_expression,
-            TokenType.POW : self.__parse_infix_expression,
-            TokenType.MODULUS : self.__parse_infix_expression,
-            TokenType.EQ_EQ : self.__parse_infix_expression,
-            TokenType.NOT_EQ : self.__parse_infix_expression,
-            TokenType.LT : self.__parse_infix_expression,
-            TokenType.GT : self.__parse_infix_expression,
-            TokenType.LT_EQ : self.__parse_infix_expression,
-            TokenType.GT_EQ : self.__parse_infix_expression,
-            TokenType.LPAREN : self.__parse_call_expression
-        }
-
         # fill the current and peek tokens
         self.__next_token()
         self.__next_token()
 
+    @property
+    def current_token(self) -> Token:
+        return self.tokens.token(self.cursor)
+
+    @property
+    def peek_token(self) -> Token:
+        return self.tokens.token(self.cursor + 1)
+
     # region Parser Helpers
     def __next_token(self) -> None:
-        self.current_token = self.peek_token
-        self.peek_token = self.lexer.next_token()
+        self.cursor += 1
+        self.current_type = self.peek_type
+
+        peek: int = self.cursor + 1
+        kinds = self.tokens.kinds
+        self.peek_type = TOKEN_TYPES[kinds[peek]] if peek < len(kinds) else TokenType.EOF
+
+    def __current_literal(self) -> Any:
+        return self.tokens.literal(self.cursor)
+
+    def __current_identifier(self) -> IdentifierLiteral:
+        return IdentifierLiteral(self.tokens.literal(self.cursor), self.tokens.symbol(self.cursor))
 
     def __current_token_is(self, tt: TokenType) -> bool:
-        return self.current_token.type == tt
+        return self.current_type == tt
 
     def __peek_token_is(self, tt: TokenType) -> bool:
-        return self.peek_token.type == tt
+        return self.peek_type == tt
 
     def __expect_peek(self, tt: TokenType) -> bool:
         if self.__peek_token_is(tt):
@@ -131,30 +149,22 @@ class Parser:
             self.__peek_error(tt)
             return False
     
-    def __current_precedence(self) -> PrecedenceType:
-        prec: int | None = PRECEDENCES.get(self.current_token.type)
-        if prec is None:
-            return PrecedenceType.P_LOWEST
-        return prec
-
-    def __peek_precedence(self) -> PrecedenceType:
-        prec: int | None = PRECEDENCES.get(self.peek_token.type)
-        if prec is None:
-            return PrecedenceType.P_LOWEST
-        return prec
+    def __location(self, index: int) -> str:
+        line, column = self.tokens.location(index)
+        return f"line {line + 1}, column {column + 1}"
 
     def __peek_error(self, tt: TokenType):
-        self.errors.append(f"Expected next token to be {tt}, got {self.peek_token.type} instead.")
+        self.errors.append(f"Expected next token to be {tt}, got {self.peek_type} instead at {self.__location(self.cursor + 1)}.")
 
     def __no_prefix_parse_fn_error(self, tt: TokenType):
-        self.errors.append(f"No Prefix Parser Function for {tt} found.")
+        self.errors.append(f"No Prefix Parser Function for {tt} found at {self.__location(self.cursor)}.")
 
     # endregion
     
     def parse_program(self) -> None:
         program: Program = Program()
 
-        while self.current_token.type != TokenType.EOF:
+        while self.current_type != TokenType.EOF:
             statement: Statement = self.__parse_statement()
             if statement is not None:
                 program.statements.append(statement)
@@ -165,10 +175,10 @@ class Parser:
 
     # region Statement methods
     def __parse_statement(self) -> Statement:
-        if self.current_token.type == TokenType.IDENT and self.__peek_token_is(TokenType.EQ):
+        if self.current_type == TokenType.IDENT and self.__peek_token_is(TokenType.EQ):
             return self.__parse_assignment_statement()
 
-        match self.current_token.type:
+        match self.current_type:
             case TokenType.LET:
                 return self.__parse_let_statement()
             case TokenType.FUNC:
@@ -193,7 +203,7 @@ class Parser:
         if not self.__expect_peek(TokenType.IDENT):
             return None
         
-        statement.name = IdentifierLiteral(self.current_token.literal)
+        statement.name = self.__current_identifier()
 
         if not self.__expect_peek(TokenType.COLON):
             return None
@@ -201,7 +211,7 @@ class Parser:
         if not self.__expect_peek(TokenType.TYPE):
             return None
 
-        statement.value_type  = self.current_token.literal
+        statement.value_type  = self.__current_literal()
 
         if not self.__expect_peek(TokenType.EQ):
             return None          
@@ -223,7 +233,7 @@ class Parser:
         if not self.__expect_peek(TokenType.IDENT):
             return None
 
-        statement.name = IdentifierLiteral(self.current_token.literal)
+        statement.name = self.__current_identifier()
 
         if not self.__expect_peek(TokenType.LPAREN):
             return None
@@ -236,7 +246,7 @@ class Parser:
         if not self.__expect_peek(TokenType.TYPE):
             return None
         
-        statement.return_type = self.current_token.literal
+        statement.return_type = self.__current_literal()
 
         if not self.__expect_peek(TokenType.LBRACE):
             return None
@@ -255,25 +265,25 @@ class Parser:
 
         self.__next_token()
 
-        first_param: FunctionParameter = FunctionParameter(self.current_token.literal)
+        first_param: FunctionParameter = FunctionParameter(self.__current_literal())
         if not self.__expect_peek(TokenType.COLON):
             return None
         
         self.__next_token()
 
-        first_param.value_type = self.current_token.literal
+        first_param.value_type = self.__current_literal()
         params.append(first_param)
 
         while self.__peek_token_is(TokenType.COMMA):
             self.__next_token()
             self.__next_token()
 
-            param: FunctionParameter = FunctionParameter(self.current_token.literal)
+            param: FunctionParameter = FunctionParameter(self.__current_literal())
             if not self.__expect_peek(TokenType.COLON):
                 return None
 
             self.__next_token()
-            param.value_type = self.current_token.literal         
+            param.value_type = self.__current_literal()         
             params.append(param)
 
         if not self.__expect_peek(TokenType.RPAREN):
@@ -310,7 +320,7 @@ class Parser:
     def __parse_assignment_statement(self) -> AssignStatement:
         statement: AssignStatement = AssignStatement()
 
-        statement.ident = IdentifierLiteral(self.current_token.literal)
+        statement.ident = self.__current_identifier()
 
         self.__next_token()  # skips the IDENT
         self.__next_token()  # skips the = 
@@ -349,84 +359,95 @@ class Parser:
 
     # region Expression methods
     def __parse_expression(self, precedence: PrecedenceType) -> Expression:
-        prefix_fn: Callable | None = self.prefix_parse_fns.get(self.current_token.type)
-        if prefix_fn is None:
-            self.__no_prefix_parse_fn_error(self.current_token.type)
-            return None
-        
-        left_expr: Expression = prefix_fn()
-
-        while not self.__peek_token_is(TokenType.SEMICOLON) and precedence.value < self.__peek_precedence().value:
-            infix_fn: Callable | None = self.infix_parse_fns.get(self.peek_token.type)
-            if infix_fn is None:
-                return left_expr
-            
-            self.__next_token()
-
-            left_expr = infix_fn(left_expr)
-        
-        return left_expr
-
-    # region Expression methods
-    def __parse_infix_expression(self, left_node: Expression) -> Expression:
-        infix_expr: InfixExpression = InfixExpression(left_node, self.current_token.literal)
-        
-        precedence = self.__current_precedence()
-        self.__next_token()
-
-        infix_expr.right_node = self.__parse_expression(precedence)
-
-        return infix_expr
-
-    def __parse_grouped_expression(self) -> Expression:
-        self.__next_token()
-
-        expression: Expression = self.__parse_expression(PrecedenceType.P_LOWEST)
-
-        if not self.__expect_peek(TokenType.RPAREN):
-            return None
-
-        return expression
-
-    def __parse_call_expression(self, function: Expression) -> None:
-        expression: CallExpression = CallExpression(function=function)
-        expression.arguments = self.__parse_expression_list(TokenType.RPAREN)
-        
-        return expression
-
-    def __parse_expression_list(self, end: TokenType) -> list[Expression]:
-        expr_list: list[Expression] = []
-
-        if self.__peek_token_is(end):
-            self.__next_token()
-            return expr_list
-        
-        self.__next_token()
-        expr_list.append(self.__parse_expression(PrecedenceType.P_LOWEST))
-
-        while self.__peek_token_is(TokenType.COMMA):
-            self.__next_token()            
-            self.__next_token()
-            
-            expr_list.append(self.__parse_expression(PrecedenceType.P_LOWEST))          
-
-        if not self.__expect_peek(end):
-            return None
-
-        return expr_list
+        """
+        Parses an expression with an explicit stack instead of recursion, so nesting depth costs no Python frames.
+        Each entry on the stack is an unfinished operator, group or call waiting for the expression being parsed,
+        along with the precedence of the expression it belongs to.
+        """
+        stack: list[tuple] = []
+        prec: int = precedence.value
+        lowest: int = PrecedenceType.P_LOWEST.value
+        precedences: dict[TokenType, int] = PRECEDENCE_VALUES
+        left: Expression = None
+
+        while True:
+            # Parse the prefix of a new expression, opening groups until a leaf is found
+            while self.current_type == TokenType.LPAREN:
+                stack.append((FrameType.GROUP, prec, None))
+                self.__next_token()
+                prec = lowest
+
+            prefix_fn: Callable | None = self.prefix_parse_fns.get(self.current_type)
+            if prefix_fn is None:
+                self.__no_prefix_parse_fn_error(self.current_type)
+                # The unfinished expression is None and is not continued, like an early return
+                left = None
+                resume: bool = False
+            else:
+                left = prefix_fn()
+                resume = True
+
+            while True:
+                if resume and self.peek_type != TokenType.SEMICOLON and prec < precedences.get(self.peek_type, lowest):
+                    self.__next_token()
+
+                    if self.current_type != TokenType.LPAREN:
+                        infix_expr: InfixExpression = InfixExpression(left, self.__current_literal())
+                        stack.append((FrameType.INFIX, prec, infix_expr))
+                        prec = precedences[self.current_type]
+                        self.__next_token()
+                        break
+
+                    call: CallExpression = CallExpression(function=left)
+                    call.arguments = []
+                    if self.__peek_token_is(TokenType.RPAREN):
+                        self.__next_token()
+                        left = call
+                        continue
+
+                    self.__next_token()
+                    stack.append((FrameType.CALL, prec, call))
+                    prec = lowest
+                    break
+
+                # The expression at the top of the stack is finished, hand it to the entry that was waiting for it
+                if len(stack) == 0:
+                    return left
+
+                kind, prec, node = stack.pop()
+                resume = True
+                match kind:
+                    case FrameType.INFIX:
+                        node.right_node = left
+                        left = node
+                    case FrameType.GROUP:
+                        if not self.__expect_peek(TokenType.RPAREN):
+                            left = None
+                    case FrameType.CALL:
+                        node.arguments.append(left)
+                        if self.__peek_token_is(TokenType.COMMA):
+                            self.__next_token()
+                            self.__next_token()
+                            stack.append((kind, prec, node))
+                            prec = lowest
+                            break
+
+                        if not self.__expect_peek(TokenType.RPAREN):
+                            node.arguments = None
+                        left = node
     # endregion
 
     # region Prefix Methods
     def __parse_identifier(self) -> Expression:
-        return IdentifierLiteral(self.current_token.literal)
+        return self.__current_identifier()
 
     def __parse_int_literal(self) -> Expression:
         int_lit: IntegerLiteral = IntegerLiteral()
 
         try:
-           int_lit.value = int(self.current_token.literal)
+           int_lit.value = int(self.__current_literal())
         except:
-            self.errors.append(f"Could not parse '{self.current_token.literal} as an integer.")
+            self.errors.append(f"Could not parse '{self.tokens.text(self.cursor)}' as an integer at {self.__location(self.cursor)}.")
             return None;
 
         return int_lit
@@ -435,9 +456,9 @@ class Parser:
         float_lit: FloatLiteral = FloatLiteral()
 
         try:
-           float_lit.value = float(self.current_token.literal)
+           float_lit.value = float(self.__current_literal())
         except:
-            self.errors.append(f"Could not parse '{self.current_token.literal}' as a float.")
+            self.errors.append(f"Could not parse '{self.tokens.text(self.cursor)}' as a float at {self.__location(self.cursor)}.")
             return None;
 
         return float_lit    
@@ -0,0 +1,187 @@
+# PassPipeline.py
+# This file implements the PassPipeline that runs LLVM's optimization passes over a module at -O0 to -O3
+
+import re
+import time
+
+import llvmlite.binding as llvm
+
+# The optimization levels, like the -O0 to -O3 flags of clang
+OPT_LEVELS: tuple[int, ...] = (0, 1, 2, 3)
+
+# The inlining threshold clang uses at each optimization level
+INLINE_THRESHOLDS: dict[int, int] = {0: 0, 1: 0, 2: 225, 3: 275}
+
+# The passes that can be run on single functions, by the name LLVM's `opt` gives them
+FUNCTION_PASSES: dict[str, str] = {
+    "sroa": "add_sroa_pass",
+    "instcombine": "add_instruction_combining_pass",
+    "gvn": "add_gvn_pass",
+    "sccp": "add_sccp_pass",
+    "simplifycfg": "add_cfg_simplification_pass",
+    "reassociate": "add_reassociate_expressions_pass",
+    "dce": "add_dead_code_elimination_pass",
+    "adce": "add_aggressive_dead_code_elimination_pass",
+    "dse": "add_dead_store_elimination_pass",
+    "jump-threading": "add_jump_threading_pass",
+    "licm": "add_licm_pass",
+    "loop-rotate": "add_loop_rotate_pass",
+    "loop-unroll": "add_loop_unroll_pass",
+    "loop-deletion": "add_loop_deletion_pass",
+    "tailcallelim": "add_tail_call_elimination_pass",
+}
+
+# A line of LLVM's pass timing report, the wall time is the last time column before the pass name
+TIMING_LINE: re.Pattern = re.compile(r"^\s*(?:[\d.]+\s+\(\s*[\d.]+%\)\s+)*([\d.]+)\s+\(\s*[\d.]+%\)\s+(\S.*?)\s*$")
+
+def parse_pass_timings(report: str) -> dict[str, float]:
+    """
+    Returns the wall time in seconds of each pass in a report from `llvm.report_and_reset_timings`,
+    adding up the passes that ran more than once, which LLVM numbers like "Dominator Tree Construction #2"
+    """
+    timings: dict[str, float] = {}
+    for line in report.splitlines():
+        match = TIMING_LINE.match(line)
+        if match is None or match.group(2) == "Total":
+            continue
+
+        name: str = re.sub(r" #\d+$", "", match.group(2))
+        timings[name] = timings.get(name, 0.0) + float(match.group(1))
+
+    return timings
+
+class PassPipeline:
+    """
+    A PassPipeline optimizes a parsed and verified module at an optimization level, the way clang does at -O0 to -O3.
+    The function passes run first over every function (instcombine, GVN, CFG simplification and the rest clean up
+    the Compiler's SSA), and then the module passes, which inline and vectorize.
+    Extra passes can be run on named functions only, after the rest of the pipeline.
+
+    Attributes
+    ----------
+    opt_level : int
+        one of `OPT_LEVELS`, 0 leaves the module as it is
+    size_level : int
+        0, 1 or 2, like clang's -O, -Os and -Oz
+    inline_threshold : int
+        how big a function the inliner inlines, `INLINE_THRESHOLDS` for the level by default
+    loop_vectorize : bool
+        whether the loop vectorizer runs, at -O2 and -O3 by default
+    slp_vectorize : bool
+        whether straight line code is vectorized, at -O2 and -O3 by default
+    function_passes : dict[str, list[str]]
+        the extra `FUNCTION_PASSES` to run on each function by name
+    time_passes : bool
+        whether LLVM times every pass
+    timings : dict[str, float]
+        the seconds each stage of the last run took, with the time of every pass when `time_passes` is set
+    report : str
+        LLVM's pass timing report of the last run, when `time_passes` is set
+
+    Methods
+    ----------
+    def run(self, module: llvm.ModuleRef, target_machine: llvm.TargetMachine | None = None) -> bool:
+        optimizes `module` in place, returns whether any pass changed it
+    """
+    def __init__(self, opt_level: int = 2, size_level: int = 0, inline_threshold: int | None = None,
+                 loop_vectorize: bool | None = None, slp_vectorize: bool | None = None,
+                 function_passes: dict[str, list[str]] | None = None, time_passes: bool = False) -> None:
+        if opt_level not in OPT_LEVELS:
+            raise ValueError(f"Unknown optimization level {opt_level}, expected one of {', '.join(map(str, OPT_LEVELS))}")
+
+        for passes in (function_passes or {}).values():
+            for name in passes:
+                if name not in FUNCTION_PASSES:
+                    raise ValueError(f"Unknown function pass {name}, expected one of {', '.join(FUNCTION_PASSES)}")
+
+        self.opt_level: int = opt_level
+        self.size_level: int = size_level
+        self.inline_threshold: int = inline_threshold if inline_threshold is not None else INLINE_THRESHOLDS[opt_level]
+        self.loop_vectorize: bool = loop_vectorize if loop_vectorize is not None else opt_level >= 2
+        self.slp_vectorize: bool = slp_vectorize if slp_vectorize is not None else opt_level >= 2
+        self.function_passes: dict[str, list[str]] = function_passes or {}
+        self.time_passes: bool = time_passes
+
+        self.timings: dict[str, float] = {}
+        self.report: str = ""
+
+    def run(self, module: llvm.ModuleRef, target_machine: llvm.TargetMachine | None = None) -> bool:
+        self.timings = {}
+        self.report = ""
+        if self.opt_level == 0 and len(self.function_passes) == 0:
+            return False
+
+        if self.time_passes:
+            # Drop whatever LLVM timed before, like the code generation of an earlier module
+            llvm.report_and_reset_timings()
+            llvm.set_time_passes(True)
+
+        changed: bool = False
+        try:
+            if self.opt_level > 0:
+                changed = self.__run_pipeline(module, target_machine)
+            if len(self.function_passes) > 0:
+                changed = self.__run_function_passes(module, target_machine) or changed
+        finally:
+            if self.time_passes:
+                self.report = llvm.report_and_reset_timings()
+                llvm.set_time_passes(False)
+                self.timings.update(parse_pass_timings(self.report))
+
+        return changed
+
+    def __builder(self) -> llvm.PassManagerBuilder:
+        builder: llvm.PassManagerBuilder = llvm.create_pass_manager_builder()
+        builder.opt_level = self.opt_level
+        builder.size_level = self.size_level
+        builder.inlining_threshold = self.inline_threshold
+        builder.loop_vectorize = self.loop_vectorize
+        builder.slp_vectorize = self.slp_vectorize
+        return builder
+
+    def __run_pipeline(self, module: llvm.ModuleRef, target_machine: llvm.TargetMachine | None) -> bool:
+        builder: llvm.PassManagerBuilder = self.__builder()
+        function_pm: llvm.FunctionPassManager = llvm.create_function_pass_manager(module)
+        module_pm: llvm.ModulePassManager = llvm.create_module_pass_manager()
+
+        # The target's cost model tells the vectorizers and the inliner what the machine can do
+        if target_machine is not None:
+            target_machine.add_analysis_passes(function_pm)
+            target_machine.add_analysis_passes(module_pm)
+
+        builder.populate(function_pm)
+        builder.populate(module_pm)
+
+        changed: bool = False
+
+        st = time.perf_counter()
+        function_pm.initialize()
+        for function in module.functions:
+            if not function.is_declaration:
+                changed = function_pm.run(function) or changed
+        function_pm.finalize()
+        self.timings["function passes"] = time.perf_counter() - st
+
+        st = time.perf_counter()
+        changed = module_pm.run(module) or changed
+        self.timings["module passes"] = time.perf_counter() - st
+
+        return changed
+
+    def __run_function_passes(self, module: llvm.ModuleRef, target_machine: llvm.TargetMachine | None) -> bool:
+        changed: bool = False
+
+        st = time.perf_counter()
+        for name, passes in self.function_passes.items():
+            function_pm: llvm.FunctionPassManager = llvm.create_function_pass_manager(module)
+            if target_machine is not None:
+                target_machine.add_analysis_passes(function_pm)
+            for pass_name in passes:
+                getattr(function_pm, FUNCTION_PASSES[pass_name])()
+
+            function_pm.initialize()
+            changed = function_pm.run(module.get_function(name)) or changed
+            function_pm.finalize()
+        self.timings["custom function passes"] = time.perf_counter() - st
+
+        return changed
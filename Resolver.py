@@ -0,0 +1,88 @@
+# Resolver.py
+# This file implements the Resolver that binds every identifier to a slot before the Compiler runs
+
+from AST import NodeVisitor, Node, Program
+from AST import LetStatement, FunctionStatement, AssignStatement
+from AST import IdentifierLiteral
+
+from Environment import PersistentEnvironment
+
+class Resolver(NodeVisitor):
+    """
+    A Resolver gives every variable and function a slot in the scope it is declared in, and sets `depth` and `slot`
+    on each IdentifierLiteral to the slot it refers to. The global scope is depth 0 and each function opens the
+    next one, with its parameters in the first slots. `frame_size` on the Program and each FunctionStatement is
+    the number of slots the scope needs, so the Compiler keeps each scope in a list and finds a name with two
+    index operations, however deeply the scopes nest.
+
+    Names are bound the way the Compiler used to look them up: blocks share the scope of their function, and a
+    `let` of a name that is already declared in an enclosing scope stores into that one. An identifier that is not
+    declared is left with a depth and slot of None.
+
+    Attributes
+    ----------
+    env : PersistentEnvironment
+        the `(depth, slot)` of each name declared in the scope being resolved
+
+    Methods
+    ----------
+    def resolve(self, node: Node) -> None:
+        binds every identifier in `node`
+    """
+    def __init__(self) -> None:
+        self.env: PersistentEnvironment = PersistentEnvironment()
+
+        # The number of slots given out in each open scope, the last one is the scope being resolved
+        self.__sizes: list[int] = [0]
+
+    def resolve(self, node: Node) -> None:
+        self.visit(node)
+
+    def __define(self, symbol: int) -> tuple[int, int]:
+        binding: tuple[int, int] = (len(self.__sizes) - 1, self.__sizes[-1])
+        self.__sizes[-1] += 1
+        self.env = self.env.define(symbol, binding, None)
+        return binding
+
+    def __bind(self, node: IdentifierLiteral, binding: tuple[int, int] | None) -> None:
+        node.depth, node.slot = binding if binding is not None else (None, None)
+
+    def __lookup(self, symbol: int) -> tuple[int, int] | None:
+        record = self.env.lookup(symbol)
+        return record[0] if record is not None else None
+
+    def visit_program(self, node: Program) -> None:
+        for stmt in node.statements:
+            self.visit(stmt)
+        node.frame_size = self.__sizes[0]
+
+    def visit_function_statement(self, node: FunctionStatement) -> None:
+        # A function declared again with the same name in the same scope takes over the slot of the first one
+        if self.env.is_local(node.name.symbol):
+            self.__bind(node.name, self.__lookup(node.name.symbol))
+        else:
+            self.__bind(node.name, self.__define(node.name.symbol))
+
+        previous_env: PersistentEnvironment = self.env
+        self.env = previous_env.child(node.name.value)
+        self.__sizes.append(0)
+
+        for p in node.parameters:
+            self.__define(p.symbol)
+        self.visit(node.body)
+
+        node.frame_size = self.__sizes.pop()
+        self.env = previous_env
+
+    def visit_let_statement(self, node: LetStatement) -> None:
+        self.visit(node.value)
+
+        binding: tuple[int, int] | None = self.__lookup(node.name.symbol)
+        self.__bind(node.name, binding if binding is not None else self.__define(node.name.symbol))
+
+    def visit_assign_statement(self, node: AssignStatement) -> None:
+        self.visit(node.right_value)
+        self.visit(node.ident)
+
+    def visit_identifier_literal(self, node: IdentifierLiteral) -> None:
+        self.__bind(node, self.__lookup(node.symbol))
@@ -0,0 +1,44 @@
+# SymbolTable.py
+# This file defines the SymbolTable class that gives every identifier a small integer id
+
+class SymbolTable:
+    """
+    A SymbolTable interns identifier names, each distinct name is stored once and gets a small integer id.
+    The Lexer interns names as it reads them, so later stages hash and compare ids instead of strings
+
+    Attributes
+    ----------
+    names : list[str]
+        the name of each symbol, indexed by its id
+    ids : dict[str, int]
+        maps each name to its id
+
+    Methods
+    ----------
+    def intern(self, name: str) -> int:
+        returns the id of `name`, adding it to the table if it is new
+
+    def name(self, symbol: int) -> str:
+        returns the name of the symbol with the id `symbol`
+    """
+    def __init__(self) -> None:
+        self.names: list[str] = []
+        self.ids: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def intern(self, name: str) -> int:
+        symbol: int | None = self.ids.get(name)
+        if symbol is None:
+            symbol = len(self.names)
+            self.names.append(name)
+            self.ids[name] = symbol
+
+        return symbol
+
+    def name(self, symbol: int) -> str:
+        return self.names[symbol]
+
+# The table shared by the Lexer, Parser, Environment and Compiler
+SYMBOL_TABLE: SymbolTable = SymbolTable()
@@ -4,6 +4,8 @@
 from enum import Enum
 from typing import Any
 
+from LineIndex import LineIndex
+
 class TokenType(Enum):
    # Special Items
    EOF = "EOF"
@@ -56,6 +58,9 @@ class TokenType(Enum):
    # Types
    TYPE = "TYPE"
 
+   # Members are singletons, so they can hash by identity instead of by name in Python
+   __hash__ = object.__hash__
+
 class Token:
     """
     A Token is an identified block of text with a specific meaning`
@@ -66,16 +71,37 @@ class Token:
         the identifier of the let assignment as an Expression
     literal : str | int | bool
         the raw text from the code
-    line_num : str
-        the line that the Token is on
+    line_num : int
+        the line that the Token is on, looked up in `lines` the first time it is read when it is not given
     position: int
-        the position on the line of the first character of the token
+        the offset in the source of the first character of the token
+    lines: LineIndex | None
+        the line index of the source, used to find `line_num` and `column`
+    column: int | None
+        the column of the first character of the token on its line
     """
-    def __init__(self, type : TokenType, literal: Any, line_num: int, position: int) -> None:
+    __slots__ = ("type", "literal", "position", "lines", "__line_num")
+
+    def __init__(self, type : TokenType, literal: Any, line_num: int | None, position: int, lines: LineIndex | None = None) -> None:
         self.type = type
         self.literal = literal
-        self.line_num = line_num
+        self.__line_num = line_num
         self.position = position
+        self.lines = lines
+
+    @property
+    def line_num(self) -> int:
+        if self.__line_num is None:
+            self.__line_num = self.lines.line(self.position)
+
+        return self.__line_num
+
+    @property
+    def column(self) -> int | None:
+        if self.lines is None:
+            return None
+
+        return self.lines.location(self.position)[1]
 
     def __str__(self) -> str:
         return f"Token[{self.type} : {self.literal} : Line {self.line_num} : Position {self.position}]"
@@ -96,6 +122,10 @@ KEYWORDS: dict[str, TokenType] = {
 
 TYPE_KEYWORDS: list[str] = ["int", "float"]
 
+# Every TokenType in a fixed order, so a TokenType can be stored as a small integer kind
+TOKEN_TYPES: list[TokenType] = list(TokenType)
+TOKEN_KINDS: dict[TokenType, int] = {tt: kind for kind, tt in enumerate(TOKEN_TYPES)}
+
 def lookup_ident(identifier: str) -> TokenType:
     token_type: TokenType | None = KEYWORDS.get(identifier)
     if token_type is not None:
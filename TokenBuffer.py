@@ -0,0 +1,178 @@
+# TokenBuffer.py
+# This file defines a compact, array backed buffer of tokens
+
+from array import array
+from typing import Any
+
+from Lexer import Lexer, SYMBOLS, DOUBLE_SYMBOLS
+from LineIndex import LineIndex
+from Token import Token, TokenType, KEYWORDS, TOKEN_TYPES, TOKEN_KINDS
+from SymbolTable import SYMBOL_TABLE
+
+# Tokens that are always spelled the same way, mapped to their text
+FIXED_TEXT: dict[TokenType, str] = {
+    tt: text for text, tt in [*SYMBOLS.items(), *DOUBLE_SYMBOLS.items(), *KEYWORDS.items()]
+}
+
+class TokenBuffer:
+    """
+    A TokenBuffer stores every token of a source as a struct of arrays instead of a list of Token objects.
+    Literals are not stored, they are sliced out of `source` (and converted to int or float) only when asked for
+
+    Attributes
+    ----------
+    source : str | None
+        the source code the offsets point into, None when the tokens came from a streamed source
+    kinds : array('B')
+        the kind of each token, an index into `TOKEN_TYPES`
+    starts : array('I')
+        the offset of the first character of each token
+    ends : array('I')
+        the offset just after the last character of each token
+    symbols : array('I')
+        the `SYMBOL_TABLE` id of each IDENT token, interned as the token is read (0 for other tokens)
+    texts : dict[int, str]
+        the text of the other tokens that are not in `FIXED_TEXT` by index, only used when `source` is None
+    line_index : LineIndex
+        the line index of the source, used to turn token offsets into lines and columns
+
+    Methods
+    ----------
+    def from_lexer(cls, lexer: Lexer) -> TokenBuffer:
+        runs `lexer` to the end and stores its tokens
+
+    def from_span(cls, source: str, start: int, end: int, line_index: LineIndex = None) -> TokenBuffer:
+        lexes part of `source`, keeping offsets relative to the whole of it
+
+    def type(self, index: int) -> TokenType:
+        returns the TokenType of the token at `index`
+
+    def text(self, index: int) -> str:
+        returns the source text of the token at `index`
+
+    def literal(self, index: int) -> Any:
+        returns the literal of the token at `index`
+
+    def symbol(self, index: int) -> int:
+        returns the symbol id of the IDENT token at `index`
+
+    def location(self, index: int) -> tuple[int, int]:
+        returns the line and column of the token at `index`
+
+    def token(self, index: int) -> Token:
+        builds a full Token for the token at `index`
+    """
+    def __init__(self, source: str | None = None, line_index: LineIndex = None) -> None:
+        self.source = source
+
+        self.kinds: array = array('B')
+        self.starts: array = array('I')
+        self.ends: array = array('I')
+        self.symbols: array = array('I')
+
+        self.texts: dict[int, str] = {}
+        self.line_index: LineIndex = line_index if line_index is not None else LineIndex(source or "")
+
+    @classmethod
+    def from_lexer(cls, lexer: Lexer) -> "TokenBuffer":
+        """
+        Reads every token from `lexer` up to and including the EOF token.
+        When the lexer is reading a `str` the literals are left in the source, otherwise the text of
+        the tokens that are not in `FIXED_TEXT` is copied out while the lexer still has it in memory
+        """
+        buffer: TokenBuffer = cls(lexer.source if isinstance(lexer.source, str) else None, lexer.line_index)
+        buffer.__fill(lexer, 0)
+
+        return buffer
+
+    @classmethod
+    def from_span(cls, source: str, start: int, end: int, line_index: LineIndex = None) -> "TokenBuffer":
+        """
+        Lexes only `source[start:end]`, but stores offsets into the whole of `source` so that lines and columns
+        are the ones of the whole file. `line_index` can be shared between the spans of the same source.
+        The span must start and end between two tokens
+        """
+        buffer: TokenBuffer = cls(source, line_index)
+        buffer.__fill(Lexer(source[start:end]), start)
+
+        return buffer
+
+    def __fill(self, lexer: Lexer, offset: int) -> None:
+        kinds, starts, ends, symbols = self.kinds, self.starts, self.ends, self.symbols
+        keep_text: bool = self.source is None
+        intern = SYMBOL_TABLE.intern
+
+        for tt, start, end in lexer.spans():
+            if tt == TokenType.IDENT:
+                symbols.append(intern(lexer.lexeme(start, end)))
+            else:
+                symbols.append(0)
+                if keep_text and tt not in FIXED_TEXT:
+                    self.texts[len(kinds)] = lexer.lexeme(start, end)
+
+            kinds.append(TOKEN_KINDS[tt])
+            starts.append(start + offset)
+            ends.append(end + offset)
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def type(self, index: int) -> TokenType:
+        """
+        Returns the TokenType at `index`, anything past the end of the buffer is EOF
+        """
+        if index >= len(self.kinds):
+            return TokenType.EOF
+
+        return TOKEN_TYPES[self.kinds[index]]
+
+    def text(self, index: int) -> str:
+        """
+        Returns the text of the token at `index` as it was written in the source
+        """
+        tt: TokenType = self.type(index)
+        if tt == TokenType.EOF:
+            return ""
+        elif tt == TokenType.IDENT:
+            return SYMBOL_TABLE.name(self.symbols[index])
+        elif self.source is not None:
+            return self.source[self.starts[index]:self.ends[index]]
+
+        text: str | None = self.texts.get(index)
+        return text if text is not None else FIXED_TEXT[tt]
+
+    def literal(self, index: int) -> Any:
+        """
+        Returns the same literal the Lexer would have put on the Token at `index`
+        """
+        text: str = self.text(index)
+
+        match self.type(index):
+            case TokenType.INT:
+                return int(text)
+            case TokenType.FLOAT:
+                return float(text)
+
+        return text
+
+    def symbol(self, index: int) -> int:
+        """
+        Returns the `SYMBOL_TABLE` id of the IDENT token at `index`
+        """
+        return self.symbols[index]
+
+    def location(self, index: int) -> tuple[int, int]:
+        """
+        Returns the line and column of the first character of the token at `index`
+        """
+        return self.line_index.location(self.starts[min(index, len(self.starts) - 1)])
+
+    def token(self, index: int) -> Token:
+        """
+        Builds a Token for the token at `index`, mostly for debugging and error messages
+        """
+        if index >= len(self.kinds):
+            # Reading past the end keeps producing the EOF token
+            index = len(self.kinds) - 1
+
+        return Token(self.type(index), self.literal(index), None, self.starts[index], self.line_index)
@@ -0,0 +1,229 @@
+# TypeChecker.py
+# This file implements the TypeChecker that works out the type of every expression before the Compiler runs
+
+from AST import NodeVisitor, Program
+from AST import ExpressionStatement, LetStatement, BlockStatement, FunctionStatement, ReturnStatement, AssignStatement, IfStatement
+from AST import InfixExpression, CallExpression
+from AST import IntegerLiteral, FloatLiteral, IdentifierLiteral, BooleanLiteral
+
+from Environment import PersistentEnvironment
+
+# The types a variable, parameter or function can be declared with, expressions can also be a "bool"
+TYPES: tuple[str, ...] = ("int", "float")
+
+# The operators that work on two numbers of the same type and give that type back
+ARITHMETIC_OPERATORS: tuple[str, ...] = ("+", "-", "*", "/", "%")
+
+# The operators that compare two values of the same type and give a bool
+COMPARISON_OPERATORS: tuple[str, ...] = ("<", "<=", ">", ">=", "==", "!=")
+
+class TypeChecker(NodeVisitor):
+    """
+    A TypeChecker sets `resolved_type` on every expression of a program and reports the programs the Compiler
+    cannot build valid IR for, so they are rejected before any LLVM work starts. Its rules are the Compiler's:
+    - both sides of an infix expression have the same type, bools can only be compared with `==` and `!=`
+    - a call passes as many arguments as the function has parameters, each of the parameter's type
+    - a `let`, assignment or `return` gives a value of the declared type
+    - an `if` condition is a bool, and a `let` inside a branch can only be used in that branch
+    - a function body has a `return` outside of any `if`, so its last block always ends
+
+    The environment maps each name to the FunctionStatement it names, or None for a variable, and its type.
+    It is a PersistentEnvironment, so leaving a scope is going back to the environment from before it.
+
+    Attributes
+    ----------
+    env : PersistentEnvironment
+        the scope of the statement being checked
+    errors : list[str]
+        the type errors found
+
+    Methods
+    ----------
+    def check(self, program: Program) -> bool:
+        checks and annotates `program`, returns whether it had no errors
+    """
+    def __init__(self) -> None:
+        self.env: PersistentEnvironment = PersistentEnvironment()
+        self.errors: list[str] = []
+
+        # The function whose body is being checked
+        self.__function: FunctionStatement | None = None
+
+        # Every variable the function declares, in any branch, since the Compiler keeps them all in one scope
+        self.__declared: set[int] = set()
+
+    def check(self, program: Program) -> bool:
+        self.visit(program)
+        return len(self.errors) == 0
+
+    def __error(self, message: str) -> None:
+        where: str = f" in function {self.__function.name.value}" if self.__function is not None else ""
+        self.errors.append(f"TYPE ERROR{where}: {message}")
+
+    def __check_declared_type(self, value_type: str, what: str) -> bool:
+        if value_type not in TYPES:
+            self.__error(f"{what} has unknown type {value_type}, expected one of {', '.join(TYPES)}")
+            return False
+        return True
+
+    def __lookup_variable(self, node: IdentifierLiteral) -> str | None:
+        record = self.env.lookup(node.symbol)
+        if record is None:
+            self.__error(f"Identifier {node.value} is not defined")
+            return None
+
+        function, value_type = record
+        if function is not None:
+            self.__error(f"Function {node.value} cannot be used as a value")
+            return None
+        return value_type
+
+    # region Statements
+    def visit_program(self, node: Program) -> None:
+        for stmt in node.statements:
+            self.visit(stmt)
+
+    def visit_expression_statement(self, node: ExpressionStatement) -> None:
+        self.visit(node.expr)
+
+    def visit_let_statement(self, node: LetStatement) -> None:
+        name: str = node.name.value
+        value_type: str | None = self.visit(node.value)
+
+        if not self.__check_declared_type(node.value_type, f"Variable {name}"):
+            return
+        if value_type is not None and value_type != node.value_type:
+            self.__error(f"Variable {name} is declared as {node.value_type} but given a {value_type}")
+
+        record = self.env.lookup(node.name.symbol)
+        if record is None and node.name.symbol in self.__declared:
+            self.__error(f"Variable {name} is declared again outside of the branch it was declared in")
+        elif record is None:
+            self.env = self.env.define(node.name.symbol, None, node.value_type)
+            self.__declared.add(node.name.symbol)
+        elif record[0] is not None:
+            self.__error(f"Variable {name} has the name of a function")
+        elif record[1] != node.value_type:
+            # The Compiler stores into the variable that already has the name
+            self.__error(f"Variable {name} is declared again as {node.value_type} but was declared as {record[1]}")
+
+    def visit_block_statement(self, node: BlockStatement) -> None:
+        for stmt in node.statements:
+            self.visit(stmt)
+
+    def visit_return_statement(self, node: ReturnStatement) -> None:
+        value_type: str | None = self.visit(node.return_value)
+        if self.__function is None:
+            self.__error("return outside of a function")
+        elif value_type is not None and value_type != self.__function.return_type:
+            self.__error(f"returns a {value_type} but is declared to return {self.__function.return_type}")
+
+    def visit_function_statement(self, node: FunctionStatement) -> None:
+        previous_function: FunctionStatement | None = self.__function
+        previous_declared: set[int] = self.__declared
+        self.__function = node
+        self.__declared = {p.symbol for p in node.parameters}
+
+        valid: bool = self.__check_declared_type(node.return_type, f"Function {node.name.value}")
+        for p in node.parameters:
+            valid = self.__check_declared_type(p.value_type, f"Parameter {p.name}") and valid
+
+        # The function is defined before its body so that it can call itself
+        if valid:
+            self.env = self.env.define(node.name.symbol, node, node.return_type)
+
+        previous_env: PersistentEnvironment = self.env
+        self.env = previous_env.child(node.name.value)
+        for p in node.parameters:
+            p.resolved_type = p.value_type
+            self.env = self.env.define(p.symbol, None, p.value_type)
+
+        self.visit(node.body)
+        if not any(isinstance(stmt, ReturnStatement) for stmt in node.body.statements):
+            self.__error("does not end with a return")
+
+        self.env = previous_env
+        self.__function = previous_function
+        self.__declared = previous_declared
+
+    def visit_assign_statement(self, node: AssignStatement) -> None:
+        value_type: str | None = self.visit(node.right_value)
+        declared_type: str | None = self.__lookup_variable(node.ident)
+
+        if value_type is not None and declared_type is not None and value_type != declared_type:
+            self.__error(f"Variable {node.ident.value} is a {declared_type} but is assigned a {value_type}")
+
+    def visit_if_statement(self, node: IfStatement) -> None:
+        condition_type: str | None = self.visit(node.condition)
+        if condition_type is not None and condition_type != "bool":
+            self.__error(f"if condition is a {condition_type}, not a bool")
+
+        # A variable declared in a branch is only stored to on that branch, so it cannot be used after the `if`
+        for branch in (node.consequence, node.alternative):
+            if branch is not None:
+                previous_env: PersistentEnvironment = self.env
+                self.visit(branch)
+                self.env = previous_env
+    # endregion
+
+    # region Expressions
+    def visit_infix_expression(self, node: InfixExpression) -> str | None:
+        operator: str = node.operator
+        left_type: str | None = self.visit(node.left_node)
+        right_type: str | None = self.visit(node.right_node)
+
+        node.resolved_type = None
+        if left_type is None or right_type is None:
+            return None
+
+        if left_type != right_type:
+            self.__error(f"{operator} cannot be used on a {left_type} and a {right_type}")
+        elif operator in ARITHMETIC_OPERATORS and left_type != "bool":
+            node.resolved_type = left_type
+        elif operator in COMPARISON_OPERATORS and (left_type != "bool" or operator in ("==", "!=")):
+            node.resolved_type = "bool"
+        else:
+            self.__error(f"{operator} cannot be used on {left_type}s")
+
+        return node.resolved_type
+
+    def visit_call_expression(self, node: CallExpression) -> str | None:
+        argument_types: list[str | None] = [self.visit(arg) for arg in node.arguments]
+
+        node.resolved_type = None
+        if not isinstance(node.function, IdentifierLiteral):
+            self.__error(f"{node.function.type().value} is not a function")
+            return None
+
+        name: str = node.function.value
+        record = self.env.lookup(node.function.symbol)
+        if record is None or record[0] is None:
+            self.__error(f"{name} is not a function")
+            return None
+
+        function: FunctionStatement = record[0]
+        if len(argument_types) != len(function.parameters):
+            self.__error(f"{name} takes {len(function.parameters)} arguments but was given {len(argument_types)}")
+        else:
+            for p, argument_type in zip(function.parameters, argument_types):
+                if argument_type is not None and argument_type != p.value_type:
+                    self.__error(f"Parameter {p.name} of {name} is a {p.value_type} but was given a {argument_type}")
+
+        node.resolved_type = function.return_type
+        return node.resolved_type
+    # endregion
+
+    # region Literals
+    def visit_integer_literal(self, node: IntegerLiteral) -> str:
+        return node.resolved_type
+
+    def visit_float_literal(self, node: FloatLiteral) -> str:
+        return node.resolved_type
+
+    def visit_identifier_literal(self, node: IdentifierLiteral) -> str | None:
+        node.resolved_type = self.__lookup_variable(node)
+        return node.resolved_type
+
+    def visit_boolean_literal(self, node: BooleanLiteral) -> str:
+        return node.resolved_type
+    # endregion
@@ -0,0 +1,71 @@
+# WorkerPool.py
+# This file implements the WorkerPool the parallel passes share, and how they cut their work into batches
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+# Each worker is handed about this many batches, so a slow batch does not hold up the others
+BATCHES_PER_WORKER: int = 4
+
+def split_batches(items: list[T], sizes: list[int], workers: int) -> list[list[T]]:
+    """
+    Cuts `items` into batches in the same order, each with about the same total of `sizes`,
+    so every one of the `workers` is handed about `BATCHES_PER_WORKER` of them
+    """
+    batches: list[list[T]] = [[]]
+    batch_size: int = sum(sizes) // (workers * BATCHES_PER_WORKER) + 1
+    batch_length: int = 0
+    for item, size in zip(items, sizes):
+        if batch_length >= batch_size:
+            batches.append([])
+            batch_length = 0
+
+        batches[-1].append(item)
+        batch_length += size
+
+    return batches
+
+class WorkerPool:
+    """
+    A WorkerPool starts its pool of worker processes the first time it is used, and should be closed
+    (or used in a `with` block) to stop them
+
+    Attributes
+    ----------
+    workers : int
+        the number of worker processes
+
+    Methods
+    ----------
+    def pool(self) -> ProcessPoolExecutor:
+        returns the pool, starting it if it has not been
+
+    def close(self) -> None:
+        stops the worker processes
+    """
+    def __init__(self, workers: int | None = None, initializer: Callable | None = None, initargs: tuple[Any, ...] = ()) -> None:
+        self.workers: int = workers or os.cpu_count() or 1
+
+        self.__initializer: Callable | None = initializer
+        self.__initargs: tuple[Any, ...] = initargs
+        self.__pool: ProcessPoolExecutor | None = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def pool(self) -> ProcessPoolExecutor:
+        if self.__pool is None:
+            self.__pool = ProcessPoolExecutor(max_workers=self.workers, initializer=self.__initializer,
+                                              initargs=self.__initargs)
+        return self.__pool
+
+    def close(self) -> None:
+        if self.__pool is not None:
+            self.__pool.shutdown()
+            self.__pool = None
@@ -1,9 +1,20 @@
 from Lexer import Lexer
+from Token import TokenType
 from Parser import Parser
+from ParallelParser import ParallelParser
+from ASTCache import ASTCache, CACHE_DIR
+from DebugWriter import DebugWriter
+from TypeChecker import TypeChecker
+from Optimizer import optimize
 from Compiler import Compiler
+from PassPipeline import PassPipeline
+from ObjectCache import ObjectCache
+from AOT import create_target_machine, build, write_objects
+from ParallelCompiler import JIT_RELOC_MODEL, ParallelCompiler
+from LazyJIT import LazyJIT
 from AST import Program
-import json
 import time
+from pathlib import Path
 
 from llvmlite import ir
 import llvmlite.binding as llvm
@@ -13,64 +24,182 @@ LEXER_DEBUG: bool = False
 PARSER_DEBUG: bool = True
 COMPILER_DEBUG: bool = True
 RUN_CODE: bool = True
+AST_CACHE: bool = True
+OBJECT_CACHE: bool = True
+OPTIMIZE: bool = True
+TIME_PASSES: bool = False
+LAZY_JIT: bool = False
 
-if __name__ == '__main__':
-    with open("src/test.trtl", "r") as f:
-        code: str = f.read()
-    
-    if LEXER_DEBUG:
-        debug_lex: Lexer = Lexer(source=code)
+SOURCE_PATH: Path = Path("src/test.trtl")
+
+# The number of processes the top-level functions are parsed in, 1 parses the file in this process
+PARSE_WORKERS: int = 1
+
+# The number of processes LLVM compiles the top-level functions in, each in a module of its own,
+# 1 compiles the whole program as one module in this process
+COMPILE_WORKERS: int = 1
+
+# The LLVM optimization level, 0 to 3 like clang's -O0 to -O3
+OPT_LEVEL: int = 2
 
-        while debug_lex.current_char is not None:
-            print(debug_lex.next_token())
+# What to build ahead of time, one of `OUTPUT_KINDS` ("obj", "shared" or "exe"), or None to only run the program
+AOT_KIND: str | None = None
+AOT_OUTPUT: Path = Path("out/output")
 
-    l: Lexer = Lexer(source=code)
-    p: Parser = Parser(lexer=l)
-    program: Program = p.parse_program()
-    
-    if len(p.errors) > 0:
-        for err in p.errors:
+if __name__ == '__main__':
+    if LEXER_DEBUG:
+        debug_lex: Lexer = Lexer(source=SOURCE_PATH)
+
+        for tok in debug_lex.tokens():
+            print(tok)
+            if tok.type == TokenType.EOF:
+                break
+
+    program: Program | None = None
+    if AST_CACHE:
+        # An unchanged file is loaded from the cache without running the Lexer or Parser
+        ast_cache: ASTCache = ASTCache()
+        cache_key: str = ast_cache.key_file(SOURCE_PATH)
+        program = ast_cache.load(cache_key)
+
+    if program is None:
+        if PARSE_WORKERS > 1:
+            with ParallelParser(workers=PARSE_WORKERS) as pp:
+                program = pp.parse(SOURCE_PATH.read_text())
+            errors: list[str] = pp.errors
+        else:
+            # The Lexer streams the file in chunks instead of reading it all into memory first
+            l: Lexer = Lexer(source=SOURCE_PATH)
+            p: Parser = Parser(lexer=l)
+            program = p.parse_program()
+            errors: list[str] = p.errors
+        
+        if len(errors) > 0:
+            for err in errors:
+                print(err)
+            exit(1)
+
+        if AST_CACHE:
+            ast_cache.store(cache_key, program)
+
+    # Invalid programs are rejected before any IR is built
+    checker: TypeChecker = TypeChecker()
+    if not checker.check(program):
+        for err in checker.errors:
             print(err)
         exit(1)
 
+    # The debug files are written on a background thread while the program compiles
+    debug_writer: DebugWriter = DebugWriter()
+
     if PARSER_DEBUG:
         print("==== PARSER DEBUG ====")
-        with open("debug/ast.json", "w") as f:
-           json.dump(program.data(), f, indent = 4)
+        debug_writer.write_ast(program, "debug/ast.json")
 
         print("Successful!")
+
+    if OPTIMIZE:
+        # The optimizer builds a new tree, so debug/ast.json still shows what the Parser produced
+        program = optimize(program)
         
     c: Compiler = Compiler()
-    c.compile(node=program)
+    if COMPILE_WORKERS > 1 or LAZY_JIT:
+        modules: list[ir.Module] = c.compile_functions(program)
+    else:
+        c.compile(node=program)
+        modules = [c.module]
 
     # Output steps
-    module: ir.Module = c.module
-    module.triple = llvm.get_default_triple()
+    triple: str = llvm.get_default_triple()
+    for module in modules:
+        module.triple = triple
+    ir_text: str = "\n".join(map(str, modules))
 
     if COMPILER_DEBUG:
         print("==== PARSER DEBUG ====")
-        with open("debug/ir.ll", "w") as f:
-            f.write(str(module))
+        debug_writer.write_ir(ir_text, "debug/ir.ll")
         print("Successful!")
 
-    if RUN_CODE:
+    # The workers optimize and build the machine code of each module, caching it function by function. The system
+    # linker is given position independent objects, which MCJIT relocates wrongly, so it gets its own
+    aot_objects: list[bytes] | None = None
+    objects: list[bytes] | None = None
+    if len(modules) > 1 and AOT_KIND is not None:
+        with ParallelCompiler(COMPILE_WORKERS, OPT_LEVEL, CACHE_DIR if OBJECT_CACHE else None) as pc:
+            aot_objects = pc.compile_objects(modules)
+    if len(modules) > 1 and RUN_CODE and not LAZY_JIT:
+        with ParallelCompiler(COMPILE_WORKERS, OPT_LEVEL, CACHE_DIR if OBJECT_CACHE else None, JIT_RELOC_MODEL) as pc:
+            objects = pc.compile_objects(modules)
+
+    if aot_objects is not None:
+        output: Path = write_objects(aot_objects, AOT_OUTPUT, AOT_KIND)
+        print(f"==== Wrote {output} ====")
+    elif AOT_KIND is not None:
         llvm.initialize()
         llvm.initialize_native_target()
         llvm.initialize_native_asmprinter()
 
-        try:
-            llvm_ir_parsed = llvm.parse_assembly(str(module))
-            llvm_ir_parsed.verify()
-        except Exception as e:
-            print(e)
-            raise
-        
-        target_machine = llvm.Target.from_default_triple().create_target_machine()
+        # The AOT build gets its own module, since MCJIT takes ownership of the one it runs
+        aot_module = llvm.parse_assembly(ir_text)
+        aot_module.verify()
+
+        aot_machine = create_target_machine(OPT_LEVEL)
+        PassPipeline(opt_level=OPT_LEVEL).run(aot_module, aot_machine)
+
+        output: Path = build(aot_module, aot_machine, AOT_OUTPUT, AOT_KIND)
+        print(f"==== Wrote {output} ====")
+
+    if RUN_CODE:
+        llvm.initialize()
+        llvm.initialize_native_target()
+        llvm.initialize_native_asmprinter()
 
-        engine = llvm.create_mcjit_compiler(llvm_ir_parsed, target_machine)
-        engine.finalize_object()
+        if LAZY_JIT:
+            # Only `main` is compiled before it runs, every other function is compiled when it is first called
+            lazy_jit: LazyJIT = LazyJIT(modules, OPT_LEVEL, CACHE_DIR if OBJECT_CACHE else None)
+            entry = lazy_jit.get_function_address('main')
+        else:
+            cached_object: bytes | None = None
+            if OBJECT_CACHE and objects is None:
+                # Machine code built for the same IR, target and optimization level is loaded instead of built again
+                object_cache: ObjectCache = ObjectCache()
+                object_key: str = object_cache.key(ir_text, triple, OPT_LEVEL)
+                cached_object = object_cache.load(object_key)
+
+            target_machine = llvm.Target.from_default_triple().create_target_machine(opt=OPT_LEVEL)
+
+            if objects is not None:
+                # The engine is given the objects the workers built, and links them together when it is finalized
+                llvm_ir_parsed = llvm.parse_assembly("")
+                llvm_ir_parsed.triple = triple
+            elif cached_object is not None:
+                # The engine only asks the cache about the module, so the IR is never parsed or optimized
+                llvm_ir_parsed = object_cache.empty_module(triple)
+            else:
+                try:
+                    llvm_ir_parsed = llvm.parse_assembly(ir_text)
+                    llvm_ir_parsed.verify()
+                except Exception as e:
+                    print(e)
+                    raise
+
+                pipeline: PassPipeline = PassPipeline(opt_level=OPT_LEVEL, time_passes=TIME_PASSES)
+                pipeline.run(llvm_ir_parsed, target_machine)
+
+                if TIME_PASSES:
+                    print("==== PASS TIMINGS ====")
+                    for name, seconds in sorted(pipeline.timings.items(), key=lambda item: -item[1]):
+                        print(f"{seconds * 1000:>10.3f} ms  {name}")
+
+            engine = llvm.create_mcjit_compiler(llvm_ir_parsed, target_machine)
+            if objects is not None:
+                pc.add_objects(engine, objects)
+            elif OBJECT_CACHE:
+                object_cache.attach(engine, object_key, cached_object)
+            engine.finalize_object()
+
+            entry = engine.get_function_address('main')
 
-        entry = engine.get_function_address('main')
         cfunc = CFUNCTYPE(c_int)(entry)
 
         st = time.time()
@@ -79,8 +208,6 @@ if __name__ == '__main__':
 
         et = time.time()
 
-        # Possible Idea for creating object files
-        # with open("out/output.o", "wb") as object_file:
-        #     target_machine.emit_object(llvm_ir_parsed, object_file.write)
+        print(f'\n\nProgram returned: {result}\n=== Executed in {round((et - st) * 1000, 6)} ms. ===')
 
-        print(f'\n\nProgram returned: {result}\n=== Executed in {round((et - st) * 1000, 6)} ms. ===')
\ No newline at end of file
+    debug_writer.close()